@@ -1,38 +1,153 @@
+import pickle
 import re
+from array import array
 from collections import Counter
 
+decoration_pattern = re.compile(r"\[.*\]")
+annotation_pattern = re.compile(r"\[[^\]]*\]")
+annotation_keyword_pattern = re.compile("|".join(re.escape(keyword) for keyword in
+                                                 ['solo', 'verse', 'intro', 'chorus', 'refrain', 'outro', 'bridge',
+                                                  'interlude', 'pre-chorus', 'end chorus', 'end refrain']))
+
 
 def check_patterns(lyrics, field="lyrics"):
     count_decorations = 0
     count_annotations = 0
     for current_song in lyrics:
         current_lyrics = current_song[field]
-        decoration_pattern = re.compile(r"\[.*\]")
         if decoration_pattern.search(current_lyrics):
             count_decorations += 1
-        if any(annotation in current_lyrics.lower() for annotation in
-               ['solo', 'verse', 'intro', 'chorus', 'refrain', 'outro', 'bridge', 'interlude', 'pre-chorus',
-                'end chorus', 'end refrain']):
+        if annotation_keyword_pattern.search(current_lyrics.lower()):
             count_annotations += 1
 
     print(f'Lyrics w/ decoration: {count_decorations}')
     print(f'Lyrics w/ annotations: {count_annotations}')
 
 
-def extract_annotations(lyrics, field="lyrics"):
-    # Get all lyrics that contain annotations.
-    lyrics_with_annotations = [l for l in lyrics if re.match(r"\[[^\]]*\]", l[field])]
+def _song_id(song):
+    return song["_id"]["artist"], song["_id"]["track"]
+
+
+class AnnotationIndex:
+    """
+    Compact table of all [annotations] in a corpus, built in one pass over the lyrics.
+
+    Every row of the table is a (song, annotation, offset) triple, stored as integers in
+    arrays: songs and distinct annotation strings are numbered in order of appearance.
+    Counts, top-N lists and per-song lookups are answered from the table without scanning
+    the lyrics again. An index can be saved to and loaded from a file.
+    """
+
+    def __init__(self):
+        self.song_ids = []
+        self.annotations = []
+        self._annotation_numbers = {}
+        self._song_numbers = None
+
+        self.row_songs = array("l")
+        self.row_annotations = array("l")
+        self.row_offsets = array("l")
+        # Rows are stored in song order; the rows of song i are row_starts[i]:row_starts[i + 1].
+        self.row_starts = array("l", [0])
+
+    def add_song(self, song_id, text):
+        """Adds the annotations of one song to the index."""
+        song_number = len(self.song_ids)
+        self.song_ids.append(song_id)
+
+        for match in annotation_pattern.finditer(text):
+            annotation_number = self._annotation_numbers.setdefault(match.group(), len(self.annotations))
+            if annotation_number == len(self.annotations):
+                self.annotations.append(match.group())
+
+            self.row_songs.append(song_number)
+            self.row_annotations.append(annotation_number)
+            self.row_offsets.append(match.start())
+
+        self.row_starts.append(len(self.row_songs))
+        self._song_numbers = None
+
+    def __len__(self):
+        return len(self.row_songs)
+
+    @property
+    def song_count(self):
+        return len(self.song_ids)
+
+    def counts(self):
+        """Returns a Counter of how often every annotation occurs in the corpus."""
+        return Counter({self.annotations[number]: count for number, count in Counter(self.row_annotations).items()})
+
+    def most_common(self, n=None):
+        """Returns the n most common annotations and their counts."""
+        return self.counts().most_common(n)
 
-    # Extract the specific annotations used.
-    annotations = []
-    for lyric in lyrics:
-        annotations.extend(re.findall(r"\[[^\]]*\]", lyric[field]))
+    def annotations_of(self, song_id):
+        """Returns the (annotation, offset) pairs of the given song, in order of appearance."""
+        if self._song_numbers is None:
+            self._song_numbers = {song_id: number for number, song_id in enumerate(self.song_ids)}
 
-    annotations_counts = Counter(annotations)
+        song_number = self._song_numbers[song_id]
+        rows = range(self.row_starts[song_number], self.row_starts[song_number + 1])
+        return [(self.annotations[self.row_annotations[row]], self.row_offsets[row]) for row in rows]
+
+    def songs_with_annotations(self):
+        """Returns the number of songs with at least one annotation."""
+        return sum(1 for start, end in zip(self.row_starts[:-1], self.row_starts[1:]) if end > start)
+
+    def songs_starting_with_annotation(self):
+        """Returns the number of songs whose lyrics start with an annotation."""
+        return sum(1 for start, end in zip(self.row_starts[:-1], self.row_starts[1:])
+                   if end > start and self.row_offsets[start] == 0)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def build_annotation_index(lyrics, field="lyrics", song_id=_song_id):
+    """
+    Builds an `AnnotationIndex` of the given songs in one pass.
+
+    Parameters
+    ----------
+    lyrics : iterable of dict
+        The song objects, as dictionaries.
+    field : str
+        The field holding the lyrics.
+    song_id : callable
+        Returns the id of a song object, (artist, track) by default.
+
+    Returns
+    -------
+    AnnotationIndex
+        The index.
+    """
+    index = AnnotationIndex()
+    for song in lyrics:
+        index.add_song(song_id(song), song[field])
+
+    return index
+
+
+def extract_annotations(lyrics, field="lyrics", index=None):
+    # Index all annotations in one pass, unless an index was given.
+    if index is None:
+        index = build_annotation_index(lyrics, field)
+
+    # Lyrics that start with an annotation.
+    lyrics_with_annotations = index.songs_starting_with_annotation()
 
     # Output statistics.
     print(
-        f"Lyrics with annotations: {len(lyrics_with_annotations)} ({100 * len(lyrics_with_annotations) / len(lyrics)}%)")
+        f"Lyrics with annotations: {lyrics_with_annotations} ({100 * lyrics_with_annotations / index.song_count}%)")
     print("100 most common annotations:")
-    for k, v in annotations_counts.most_common(100):
+    for k, v in index.most_common(100):
         print(f"{k}: {v}")
+
+    return index
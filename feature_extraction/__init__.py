@@ -1,16 +1,46 @@
 """
 Extracts lyrics features (readability, lexical, linguistic, complexity, song structure, etc.).
+
+The feature modules, and the libraries and data they depend on, are only loaded when they
+are first used, so importing a single feature module stays cheap.
 """
 
-from . import features_compression as fcomp
-from . import features_lexical as flex
-from . import features_readability as fread
-from . import features_linguistic as fling
-from . import features_structure as fstruct
-from . import features_rhyme as frhyme
+import importlib
+
+from .analysis import SongAnalysis
+from .cache import cache_stats
+from .profiling import Profiler
+from . import profiling
+from .registry import FAMILIES, resolve_families
+
+_MODULE_ALIASES = {
+    "fcomp": "features_compression",
+    "flex": "features_lexical",
+    "fread": "features_readability",
+    "fling": "features_linguistic",
+    "fstruct": "features_structure",
+    "frhyme": "features_rhyme",
+}
+
+
+def __getattr__(name):
+    # Load the feature modules on first access, e.g., feature_extraction.flex.
+    if name in _MODULE_ALIASES:
+        return importlib.import_module("." + _MODULE_ALIASES[name], __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+def has_sufficient_lyrics(lyrics):
+    """Returns whether the given sanitized lyrics are long enough for computing our features."""
+    return lyrics.count(" ") >= 2
 
-def extract_and_add_features(song):
+
+def _family(function):
+    # The family of a feature is the module computing it, e.g., "readability".
+    return function.__module__.rpartition(".features_")[2]
+
+
+def extract_and_add_features(song, analysis=None, profiler=None, families=None):
     """
     Extracts features for the given song and adds the feature values to the song object.
 
@@ -20,104 +50,159 @@ def extract_and_add_features(song):
     ----------
     song : dict
         The song objects, as a dictionary.
+    analysis : SongAnalysis, optional
+        An analysis of the song's sanitized lyrics to reuse, e.g., one that was POS tagged
+        together with other songs.
+    profiler : Profiler, optional
+        Records the time taken by every feature, and the exception types of failures.
+    families : iterable of str, optional
+        The feature families to compute (see `registry.FAMILIES`), all by default. If only some
+        families are computed, their features are merged into the song's existing features; if
+        that fails, the song's existing features of these families are set to None.
 
     Returns
     -------
     bool
         True is the feature extraction was successfull, False otherwise.
     """
+    merge = families is not None
+    families = resolve_families(families)
+
+    # Load the modules of the selected families only. This happens outside of the try
+    # block below, so that a missing library is reported instead of failing every song.
+    for family in families:
+        importlib.import_module("." + FAMILIES[family].module, __name__)
+
     lyrics = song['sanitized_lyrics']
     features = {}
 
+    call_feature = profiler.call if profiler is not None else profiling.call
+
+    def compute(name, function, *arguments):
+        features[name] = call_feature(_family(function), name, function, *arguments)
+
+    def compute_all(name, function, *arguments):
+        # For functions computing several features at once, as a dictionary.
+        features.update(call_feature(_family(function), name, function, *arguments))
+
+    def discard_stale_features():
+        # When recomputing some families fails, the song must not keep their features
+        # computed by an earlier run (e.g., by older code); they are marked as failed.
+        if merge and 'features' in song:
+            song['features'] = song['features'] | {name: None for family in families
+                                                   for name in FAMILIES[family].features}
+
     # Skip songs that do not have sufficient lyrics for computing our features.
-    if lyrics.count(" ") < 2:
+    if not has_sufficient_lyrics(lyrics):
+        discard_stale_features()
+        if profiler is not None:
+            profiler.count_song("skipped")
         return False
 
+    # All features of the sanitized lyrics share one analysis, so that,
+    # e.g., the lyrics are tokenized only once.
+    if analysis is None:
+        analysis = SongAnalysis(lyrics)
+
     try:
         # Compute compression features
-        features['compression_ratio'] = fcomp.get_compression_ratio(lyrics)
+        if 'compression' in families:
+            from . import features_compression as fcomp
+
+            compute('compression_ratio', fcomp.get_compression_ratio, analysis.text)
 
         # Compute readability features
-        features['readability_flesch_kincaid_grade'] = fread.get_flesch_kincaid_grade(lyrics)
-        features['readability_flesch_reading_ease'] = fread.get_flesch_reading_ease(lyrics)
-        features['readability_smog'] = fread.get_smog(lyrics)
-        features['readability_automated_readability_index'] = fread.get_automated_readability_index(lyrics)
-        features['readability_coleman_liau_index'] = fread.get_coleman_liau_index(lyrics)
-        features['readability_dale_chall_readability_score'] = fread.get_dale_chall_readability_score(lyrics)
-        features['readability_difficult_words'] = fread.get_difficult_words(lyrics)
-        features['readability_linsear_write_formula'] = fread.get_linsear_write_formula(lyrics)
-        features['readability_gunning_fog'] = fread.get_gunning_fog(lyrics)
-        features['readability_fernandez_huerta'] = fread.get_fernandez_huerta(lyrics)
-        features['readability_szigriszt_pazos'] = fread.get_szigriszt_pazos(lyrics)
-        features['readability_gutierrez_polini'] = fread.get_gutierrez_polini(lyrics)
-        features['readability_crawford'] = fread.get_crawford(lyrics)
+        if 'readability' in families:
+            from . import features_readability as fread
+
+            compute('readability_flesch_kincaid_grade', fread.get_flesch_kincaid_grade, analysis)
+            compute('readability_flesch_reading_ease', fread.get_flesch_reading_ease, analysis)
+            compute('readability_smog', fread.get_smog, analysis)
+            compute('readability_automated_readability_index', fread.get_automated_readability_index, analysis)
+            compute('readability_coleman_liau_index', fread.get_coleman_liau_index, analysis)
+            compute('readability_dale_chall_readability_score', fread.get_dale_chall_readability_score, analysis)
+            compute('readability_difficult_words', fread.get_difficult_words, analysis)
+            compute('readability_linsear_write_formula', fread.get_linsear_write_formula, analysis)
+            compute('readability_gunning_fog', fread.get_gunning_fog, analysis)
+            compute('readability_fernandez_huerta', fread.get_fernandez_huerta, analysis)
+            compute('readability_szigriszt_pazos', fread.get_szigriszt_pazos, analysis)
+            compute('readability_gutierrez_polini', fread.get_gutierrez_polini, analysis)
+            compute('readability_crawford', fread.get_crawford, analysis)
 
         # Compute lexical features
-        features['token_count'] = flex.get_token_count(lyrics)
-        features['character_count'] = flex.get_character_count(lyrics)
-        features['repeated_token_ratio'] = flex.get_repeated_token_ratio(lyrics)
-        features['unique_tokens_per_line'] = flex.get_unique_tokens_per_line(lyrics)
-        features['average_token_length'] = flex.get_average_token_length(lyrics)
-        features['average_tokens_per_line'] = flex.get_average_tokens_per_line(lyrics)
-        features['line_count'] = flex.get_line_count(lyrics)
-        features['unique_line_count'] = flex.get_unique_line_count(lyrics)
-        features['blank_line_count'] = flex.get_blank_line_count(lyrics)
-        features['blank_line_ratio'] = flex.get_blank_line_ratio(lyrics)
-        features['repeated_line_ratio'] = flex.get_repeated_line_ratio(lyrics)
-        features['exclamation_mark_count'] = flex.get_exclamation_mark_count(lyrics)
-        features['question_mark_count'] = flex.get_question_mark_count(lyrics)
-        features['digit_count'] = flex.get_digit_count(lyrics)
-        features['colon_count'] = flex.get_colon_count(lyrics)
-        features['semicolon_count'] = flex.get_semicolon_count(lyrics)
-        features['quote_count'] = flex.get_quote_count(lyrics)
-        features['comma_count'] = flex.get_comma_count(lyrics)
-        features['dot_count'] = flex.get_dot_count(lyrics)
-        features['hyphen_count'] = flex.get_hyphen_count(lyrics)
-        features['parens_count'] = flex.get_parens_count(lyrics)
-        features['punctuation_count'] = flex.get_punctuation_count(lyrics)
-        features['digit_ratio'] = flex.get_digit_ratio(lyrics)
-        features['punctuation_ratio'] = flex.get_punctuation_ratio(lyrics)
-        features['stop_word_count'] = flex.get_stop_word_count(lyrics)
-        features['stop_word_ratio'] = flex.get_stop_word_ratio(lyrics)
-        features['stop_words_per_line'] = flex.get_stop_words_per_line(lyrics)
-        features['unique_bigram_ratio'] = flex.get_unique_bigram_ratio(lyrics)
-        features['unique_trigram_ratio'] = flex.get_unique_trigram_ratio(lyrics)
-        features['hapax_legomenon_ratio'] = flex.get_legomenon_ratio(lyrics, n=1)
-        features['dis_legomenon_ratio'] = flex.get_legomenon_ratio(lyrics, n=2)
-        features['tris_legomenon_ratio'] = flex.get_legomenon_ratio(lyrics, n=3)
-        features['mtld'] = flex.get_mtld(lyrics)
-        features['herdan'] = flex.get_herdan(lyrics)
-        features['summer'] = flex.get_summer(lyrics)
-        features['dugast'] = flex.get_dugast(lyrics)
-        features['maas'] = flex.get_maas(lyrics)
-        features['pronoun_frequency'] = flex.get_pronoun_frequency(lyrics)
-        features['past_tense_ratio'] = flex.get_past_tense_ratio(lyrics)
-        features['adjective_frequency'] = flex.get_adjective_frequency(lyrics)
-        features['adverb_frequency'] = flex.get_adverb_frequency(lyrics)
-        features['noun_frequency'] = flex.get_noun_frequency(lyrics)
-        features['verb_frequency'] = flex.get_verb_frequency(lyrics)
+        if 'lexical' in families:
+            from . import features_lexical as flex
+
+            compute('token_count', flex.get_token_count, analysis)
+            compute('character_count', flex.get_character_count, analysis)
+            compute('repeated_token_ratio', flex.get_repeated_token_ratio, analysis)
+            compute('unique_tokens_per_line', flex.get_unique_tokens_per_line, analysis)
+            compute('average_token_length', flex.get_average_token_length, analysis)
+            compute('average_tokens_per_line', flex.get_average_tokens_per_line, analysis)
+            compute('line_count', flex.get_line_count, analysis)
+            compute('unique_line_count', flex.get_unique_line_count, analysis)
+            compute('blank_line_count', flex.get_blank_line_count, analysis)
+            compute('blank_line_ratio', flex.get_blank_line_ratio, analysis)
+            compute('repeated_line_ratio', flex.get_repeated_line_ratio, analysis)
+            compute('exclamation_mark_count', flex.get_exclamation_mark_count, analysis)
+            compute('question_mark_count', flex.get_question_mark_count, analysis)
+            compute('digit_count', flex.get_digit_count, analysis)
+            compute('colon_count', flex.get_colon_count, analysis)
+            compute('semicolon_count', flex.get_semicolon_count, analysis)
+            compute('quote_count', flex.get_quote_count, analysis)
+            compute('comma_count', flex.get_comma_count, analysis)
+            compute('dot_count', flex.get_dot_count, analysis)
+            compute('hyphen_count', flex.get_hyphen_count, analysis)
+            compute('parens_count', flex.get_parens_count, analysis)
+            compute('punctuation_count', flex.get_punctuation_count, analysis)
+            compute('digit_ratio', flex.get_digit_ratio, analysis)
+            compute('punctuation_ratio', flex.get_punctuation_ratio, analysis)
+            compute('stop_word_count', flex.get_stop_word_count, analysis)
+            compute('stop_word_ratio', flex.get_stop_word_ratio, analysis)
+            compute('stop_words_per_line', flex.get_stop_words_per_line, analysis)
+            compute('unique_bigram_ratio', flex.get_unique_bigram_ratio, analysis)
+            compute('unique_trigram_ratio', flex.get_unique_trigram_ratio, analysis)
+            compute('hapax_legomenon_ratio', flex.get_legomenon_ratio, analysis, 1)
+            compute('dis_legomenon_ratio', flex.get_legomenon_ratio, analysis, 2)
+            compute('tris_legomenon_ratio', flex.get_legomenon_ratio, analysis, 3)
+            compute('mtld', flex.get_mtld, analysis)
+            compute('herdan', flex.get_herdan, analysis)
+            compute('summer', flex.get_summer, analysis)
+            compute('dugast', flex.get_dugast, analysis)
+            compute('maas', flex.get_maas, analysis)
+            compute('pronoun_frequency', flex.get_pronoun_frequency, analysis)
+            compute('past_tense_ratio', flex.get_past_tense_ratio, analysis)
+            compute('adjective_frequency', flex.get_adjective_frequency, analysis)
+            compute('adverb_frequency', flex.get_adverb_frequency, analysis)
+            compute('noun_frequency', flex.get_noun_frequency, analysis)
+            compute('verb_frequency', flex.get_verb_frequency, analysis)
 
         # Compute linguistic features.
-        features['uncommon_words_ratio'] = fling.get_uncommon_words_ratio(lyrics)
-
-        # Compute structural features.
-        features['title_occurences'] = fstruct.get_title_occurrences(song['lyrics'], song['_id']['track'])
-        features['number_of_sections'] = fstruct.get_number_of_total_sections(song['lyrics'])
-        features['number_of_verses'] = fstruct.get_number_of_verses(song['lyrics'])
-        features['starts_with_chorus'] = fstruct.get_starts_with_chorus(song['lyrics'])
-        features['relation_verses_sections'] = fstruct.get_relation_verses_sections(song['lyrics'])
-        features['relation_chorus_sections'] = fstruct.get_relation_chorus_sections(song['lyrics'])
-        features['ends_with_two_chorus_repetitions'] = fstruct.get_ends_with_two_chorus_repetitions(song['lyrics'])
-        features['pattern_verse_chorus_alternating'] = fstruct.get_verse_chorus_alternating(song['lyrics'])
-        features['pattern_two_verses_at_least_one_chorus'] = fstruct.get_two_verses_at_least_one_chorus(song['lyrics'])
-        features['pattern_two_choruses_at_least_one_verse'] = fstruct.get_two_choruses_at_least_one_verse(
-            song['lyrics'])
+        if 'linguistic' in families:
+            from . import features_linguistic as fling
+
+            compute('uncommon_words_ratio', fling.get_uncommon_words_ratio, analysis)
+
+        # Compute structural features, from one segmentation of the lyrics.
+        if 'structure' in families:
+            from . import features_structure as fstruct
+
+            compute_all('structure_features', fstruct.get_structure_features, song['lyrics'], song['_id']['track'])
 
         # Compute rhyme features.
-        features |= frhyme.get_rhyme_features(lyrics)
+        if 'rhyme' in families:
+            from . import features_rhyme as frhyme
+
+            compute_all('rhyme_features', frhyme.get_rhyme_features, analysis)
     except Exception as e:
         # print(f'{type(e)=} --- {e}')
+        discard_stale_features()
+        if profiler is not None:
+            profiler.count_song("failed")
         return False
 
-    song['features'] = features
+    if profiler is not None:
+        profiler.count_song("extracted")
+
+    song['features'] = song.get('features', {}) | features if merge else features
     return True
@@ -1,28 +1,79 @@
 import argparse
-import json
+import os
 import pickle
+from itertools import islice
 from tqdm import tqdm
 
-from . import extract_and_add_features
+from .columnar import FeatureTableWriter, is_parquet
+from .parallel import extract_features
+from .profiling import Profiler
+from .registry import FAMILIES
+from .lexicon import DATA_DIR_VARIABLE
+from .streaming import SongWriter, is_json_lines, read_songs, recover_songs, song_key
 
 def main():
-    # Read data
-    lyrics = pickle.load(open(args.lyrics_pickle, "rb"))[:1000]
+    # Read data. JSON lines input is read lazily, song by song.
+    if args.lyrics_pickle:
+        lyrics = pickle.load(open(args.lyrics_pickle, "rb"))[:args.limit]
+        total = len(lyrics)
+    else:
+        lyrics = islice(read_songs(args.input), args.limit)
+        total = args.limit
+
+    # Skip songs that were completed by an earlier, interrupted run.
+    if args.resume:
+        done = recover_songs(args.output_path)
+        lyrics = (song for song in lyrics if song_key(song) not in done)
+        total = None
 
     # Extract features for all songs
-    for current_song in tqdm(lyrics, desc="Feature extraction"):
-        extract_and_add_features(current_song)
+    profiler = Profiler() if args.profile else None
+    songs = tqdm(extract_features(lyrics, args.workers, args.chunk_size, profiler, args.features), total=total, desc="Feature extraction")
+
+    # Write data. JSON lines output is written as soon as a song is done
+    # and regularly forced to disk, so that an interrupted run can be resumed.
+    if is_json_lines(args.output_path):
+        with SongWriter(args.output_path, "a" if args.resume else "w") as writer:
+            for i, song in enumerate(songs, start=1):
+                writer.write(song)
+                if i % args.checkpoint_every == 0:
+                    writer.flush()
+    elif is_parquet(args.output_path):
+        # Only the ids, genres, release dates and features are written, one column each.
+        with FeatureTableWriter(args.output_path) as writer:
+            for song in songs:
+                writer.write(song)
+    else:
+        pickle.dump(list(songs), open(args.output_path, "wb"))
 
-    # Write data.
-    pickle.dump(lyrics, open(args.output_path, "wb"))
+    # Report where the time went and why songs failed.
+    if profiler is not None:
+        profiler.save(args.profile)
+        print(profiler.summary())
 
 
 if __name__ == "__main__":
     # Parse command line arguments.
     parser = argparse.ArgumentParser()
-    parser.add_argument("--lyrics-pickle", dest="lyrics_pickle", required=True, help="Pickle file containing lyrics.")
-    parser.add_argument("--output-path", dest="output_path", required=True, help="The file to which the computed features should be written.")
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--lyrics-pickle", dest="lyrics_pickle", help="Pickle file containing lyrics.")
+    input_group.add_argument("--input", dest="input", help="JSON lines file (optionally gzipped) containing lyrics, read lazily.")
+    parser.add_argument("--output-path", dest="output_path", required=True, help="The file to which the computed features should be written. Paths ending in .jsonl/.json (optionally .gz) are written as JSON lines while extracting, paths ending in .parquet as a feature table, anything else as a pickle.")
+    parser.add_argument("--workers", dest="workers", type=int, default=1, help="Number of worker processes used for feature extraction.")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=64, help="Number of songs sent to a worker process at once.")
+    parser.add_argument("--limit", dest="limit", type=int, default=None, help="Only process the first LIMIT songs.")
+    parser.add_argument("--checkpoint-every", dest="checkpoint_every", type=int, default=1000, help="Force the JSON lines output to disk every CHECKPOINT_EVERY songs.")
+    parser.add_argument("--resume", dest="resume", action="store_true", help="Resume an interrupted run, skipping songs that already have features in the JSON lines output.")
+    parser.add_argument("--features", dest="features", nargs="+", choices=list(FAMILIES), default=None, help="Only compute these feature families and merge them into the songs' existing features (default: all families).")
+    parser.add_argument("--profile", dest="profile", default=None, help="Record the time taken by every feature and the failures, write them to this JSON file, and print a summary.")
+    parser.add_argument("--data-dir", dest="data_dir", default=None, help="Directory containing wiktionary_english.json (default: ./data).")
     args = parser.parse_args()
 
+    if args.data_dir is not None:
+        os.environ[DATA_DIR_VARIABLE] = args.data_dir
+
+    if args.resume and not is_json_lines(args.output_path):
+        parser.error("--resume requires a JSON lines output path.")
+
     # Run main.
     main()
@@ -0,0 +1,136 @@
+"""
+Shared, lazily computed analysis of a song's lyrics (tokens, lines, POS tags, etc.).
+"""
+
+from collections import Counter
+from functools import cached_property
+
+from .cache import BoundedCache
+
+# Analyses of lyrics passed to the get_* functions as strings, so that calling
+# several of them with the same lyrics still tokenizes the lyrics only once.
+_analyses = BoundedCache("analysis", max_entries=4, max_bytes=1_000_000)
+
+
+class SongAnalysis:
+    """
+    Intermediate representations of a song's lyrics that several feature modules need.
+
+    Every representation is computed on first access and then kept for the lifetime of the
+    object, so that, e.g., the lyrics are tokenized only once per song no matter how many
+    features use the tokens. The libraries computing them are imported on first use, too.
+    All `get_*` functions of the feature modules accept either the lyrics as a string or a
+    `SongAnalysis` of them.
+
+    Parameters
+    ----------
+    text : str
+        The lyrics of the song.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def of(cls, text):
+        """Returns `text` if it already is a `SongAnalysis`, and a (recently cached) analysis of it otherwise."""
+        if isinstance(text, cls):
+            return text
+        return _analyses.get(text, cls)
+
+    @cached_property
+    def lines(self):
+        """The lines of the lyrics, including blank lines."""
+        return self.text.split("\n")
+
+    @cached_property
+    def character_counts(self):
+        """The number of occurrences of every character in the lyrics, counted in one vectorized pass."""
+        import numpy as np
+
+        code_points = np.frombuffer(self.text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+        # Lyrics are mostly ASCII, which a histogram counts much faster than sorting.
+        is_ascii = code_points < 128
+        ascii_counts = np.bincount(code_points[is_ascii], minlength=128)
+        counts = Counter({chr(c): int(ascii_counts[c]) for c in np.flatnonzero(ascii_counts)})
+
+        other_code_points, other_counts = np.unique(code_points[~is_ascii], return_counts=True)
+        counts.update(dict(zip(map(chr, other_code_points.tolist()), other_counts.tolist())))
+
+        return counts
+
+    @cached_property
+    def split_token_ids(self):
+        """The ids of the whitespace separated tokens of the lyrics (`text.split()`) in a vocabulary of this song."""
+        from .vocabulary import Vocabulary
+        return Vocabulary().intern(self.text.split())
+
+    @cached_property
+    def sentences(self):
+        """The sentences of the lyrics, as split by NLTK."""
+        from nltk.tokenize import sent_tokenize
+        return sent_tokenize(self.text)
+
+    @cached_property
+    def tokens(self):
+        """The tokens of the lyrics, identical to `word_tokenize(text)`."""
+        from nltk.tokenize import word_tokenize
+
+        # word_tokenize splits into sentences first and tokenizes every sentence
+        # on its own, so we can reuse the sentence split.
+        return [token for sentence in self.sentences for token in word_tokenize(sentence, preserve_line=True)]
+
+    @cached_property
+    def line_tokens(self):
+        """The tokens of every non-blank line, each line tokenized on its own."""
+        from nltk.tokenize import word_tokenize
+        return [word_tokenize(line) for line in self.lines if line.strip() != ""]
+
+    @cached_property
+    def pos_tags(self):
+        """The (token, tag) pairs of `tokens`, as tagged by NLTK."""
+        from nltk import pos_tag
+        return pos_tag(self.tokens)
+
+    @cached_property
+    def pos_tag_counts(self):
+        """The number of tokens with every POS tag in `pos_tags`."""
+        return Counter(tag for _, tag in self.pos_tags)
+
+    @cached_property
+    def readability_statistics(self):
+        """The counts all readability formulas are computed from, see `features_readability`."""
+        from .features_readability import ReadabilityStatistics
+        return ReadabilityStatistics(self.text)
+
+    @cached_property
+    def diversity(self):
+        """The type/token counts, frequency spectrum and MTLD factors of `tokens`, see `diversity`."""
+        from .diversity import DiversityStatistics
+        return DiversityStatistics(self.tokens)
+
+    @cached_property
+    def richness_diversity(self):
+        """The same counts for the lyrics as tokenized by lexicalrichness, which some indices are defined on."""
+        from .diversity import DiversityStatistics, richness_tokenize
+        return DiversityStatistics(richness_tokenize(self.text))
+
+
+def pos_tag_batch(analyses):
+    """
+    POS tags the tokens of several analyses at once and stores the tags in them.
+
+    The tagger is loaded once for the whole batch instead of once per song. Songs are still
+    tagged independently of each other, so the tags are the same as with `pos_tag`.
+
+    Parameters
+    ----------
+    analyses : list of SongAnalysis
+        The analyses to tag.
+    """
+    from nltk import pos_tag_sents
+
+    tags = pos_tag_sents([analysis.tokens for analysis in analyses])
+    for analysis, song_tags in zip(analyses, tags):
+        analysis.pos_tags = song_tags
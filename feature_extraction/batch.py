@@ -0,0 +1,216 @@
+"""
+Computes the simple counting features of many songs at once with vectorized operations.
+
+The lyrics of all songs are concatenated into one buffer of code points (and their tokens
+into one array of token ids), and per-song values are aggregated over offset arrays, so
+the cost per song is a handful of array operations instead of many Python function calls.
+The values are the same as those of the per-song functions in `features_lexical`, which
+remain the way to compute all other features.
+"""
+
+import numpy as np
+
+from .analysis import SongAnalysis
+from .vocabulary import Vocabulary
+
+# Features computed from the characters of the lyrics.
+CHARACTER_FEATURES = [
+    'character_count',
+    'line_count',
+    'blank_line_count',
+    'blank_line_ratio',
+    'exclamation_mark_count',
+    'question_mark_count',
+    'digit_count',
+    'colon_count',
+    'semicolon_count',
+    'quote_count',
+    'comma_count',
+    'dot_count',
+    'hyphen_count',
+    'parens_count',
+    'punctuation_count',
+    'digit_ratio',
+    'punctuation_ratio',
+]
+
+# Features computed from the tokens of the lyrics.
+TOKEN_FEATURES = [
+    'token_count',
+    'repeated_token_ratio',
+    'unique_tokens_per_line',
+    'average_token_length',
+    'average_tokens_per_line',
+    'hapax_legomenon_ratio',
+    'dis_legomenon_ratio',
+    'tris_legomenon_ratio',
+]
+
+# Character classes, in the order of the per-class count columns.
+_PUNCTUATION_CLASSES = ['exclamation_mark', 'question_mark', 'colon', 'semicolon', 'quote', 'comma', 'dot',
+                        'hyphen', 'parens']
+_OTHER, _NEWLINE, _DIGIT = 0, 1, 2
+_FIRST_PUNCTUATION = 3
+_CLASS_COUNT = _FIRST_PUNCTUATION + len(_PUNCTUATION_CLASSES)
+
+_ASCII_CLASSES = np.full(128, _OTHER, dtype=np.intp)
+_ASCII_CLASSES[ord("\n")] = _NEWLINE
+_ASCII_CLASSES[ord("0"):ord("9") + 1] = _DIGIT
+for _i, _characters in enumerate(['!', '?', ':', ';', '"', ',', '.', '-', '()']):
+    for _c in _characters:
+        _ASCII_CLASSES[ord(_c)] = _FIRST_PUNCTUATION + _i
+
+
+def _ratio(numerator, denominator):
+    # Songs for which the per-song function raises a ZeroDivisionError get NaN.
+    return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan),
+                     where=np.asarray(denominator) != 0)
+
+
+def _segment_ids(lengths):
+    # The index of the song every element of a concatenated buffer belongs to.
+    return np.repeat(np.arange(len(lengths)), lengths)
+
+
+def intern_tokens(token_lists, vocabulary=None):
+    """
+    Maps the tokens of several songs to integer ids.
+
+    Parameters
+    ----------
+    token_lists : list of list of str
+        The tokens of every song.
+    vocabulary : Vocabulary, optional
+        The vocabulary to take the ids from, e.g., `get_vocabulary()`; a new one by default.
+
+    Returns
+    -------
+    ids : numpy.ndarray
+        The int32 ids of all tokens, song after song.
+    offsets : numpy.ndarray
+        The tokens of song i are `ids[offsets[i]:offsets[i + 1]]`.
+    vocabulary : Vocabulary
+        The vocabulary, now containing every token; ids are assigned in order of first appearance.
+    """
+    if vocabulary is None:
+        vocabulary = Vocabulary()
+
+    ids = vocabulary.intern(token for tokens in token_lists for token in tokens)
+    offsets = np.zeros(len(token_lists) + 1, dtype=np.int64)
+    np.cumsum([len(tokens) for tokens in token_lists], out=offsets[1:])
+
+    return ids, offsets, vocabulary
+
+
+def _character_features(texts):
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    code_points = np.frombuffer("".join(texts).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    song_ids = _segment_ids(lengths)
+
+    # Classify every character; only digits can be non-ASCII.
+    classes = np.full(len(code_points), _OTHER, dtype=np.intp)
+    is_ascii = code_points < 128
+    classes[is_ascii] = _ASCII_CLASSES[code_points[is_ascii]]
+    other_code_points, other_inverse = np.unique(code_points[~is_ascii], return_inverse=True)
+    other_classes = np.array([_DIGIT if chr(c).isdigit() else _OTHER for c in other_code_points.tolist()],
+                             dtype=np.intp)
+    classes[~is_ascii] = other_classes[other_inverse]
+
+    class_counts = np.bincount(song_ids * _CLASS_COUNT + classes,
+                               minlength=len(texts) * _CLASS_COUNT).reshape(len(texts), _CLASS_COUNT)
+
+    # Blank lines are counted as non-overlapping occurrences of "\n\n",
+    # i.e., every run of k newlines contributes k // 2.
+    newlines = np.flatnonzero(classes == _NEWLINE)
+    newline_songs = song_ids[newlines]
+    run_starts = np.ones(len(newlines), dtype=bool)
+    run_starts[1:] = (np.diff(newlines) != 1) | (np.diff(newline_songs) != 0)
+    run_lengths = np.diff(np.append(np.flatnonzero(run_starts), len(newlines)))
+    blank_line_count = np.bincount(newline_songs[run_starts], weights=run_lengths // 2,
+                                   minlength=len(texts)).astype(np.int64)
+
+    line_count = class_counts[:, _NEWLINE] + 1
+    punctuation_counts = class_counts[:, _FIRST_PUNCTUATION:]
+    punctuation_count = punctuation_counts.sum(axis=1)
+    digit_count = class_counts[:, _DIGIT]
+
+    features = {
+        'character_count': lengths,
+        'line_count': line_count,
+        'blank_line_count': blank_line_count,
+        'blank_line_ratio': _ratio(blank_line_count, line_count),
+    }
+    features.update({name + '_count': punctuation_counts[:, i] for i, name in enumerate(_PUNCTUATION_CLASSES)})
+    features['digit_count'] = digit_count
+    features['punctuation_count'] = punctuation_count
+    features['digit_ratio'] = _ratio(digit_count, lengths)
+    features['punctuation_ratio'] = _ratio(punctuation_count, lengths)
+
+    return features, line_count
+
+
+def _token_features(token_lists, line_count):
+    ids, offsets, vocabulary = intern_tokens(token_lists)
+    token_count = np.diff(offsets)
+    song_ids = _segment_ids(token_count)
+
+    token_lengths = np.fromiter(map(len, vocabulary), dtype=np.int64, count=len(vocabulary))
+    total_length = np.bincount(song_ids, weights=token_lengths[ids], minlength=len(token_lists))
+
+    # Count every distinct (song, token) pair.
+    pairs, pair_counts = np.unique(song_ids * max(len(vocabulary), 1) + ids, return_counts=True)
+    pair_songs = pairs // max(len(vocabulary), 1)
+    type_count = np.bincount(pair_songs, minlength=len(token_lists))
+    legomenon_ratios = [_ratio(np.bincount(pair_songs[pair_counts == n], minlength=len(token_lists)), type_count)
+                        for n in (1, 2, 3)]
+
+    return {
+        'token_count': token_count,
+        'repeated_token_ratio': 1 - legomenon_ratios[0],
+        'unique_tokens_per_line': _ratio(type_count, line_count),
+        'average_token_length': _ratio(total_length, token_count),
+        'average_tokens_per_line': _ratio(token_count, line_count),
+        'hapax_legomenon_ratio': legomenon_ratios[0],
+        'dis_legomenon_ratio': legomenon_ratios[1],
+        'tris_legomenon_ratio': legomenon_ratios[2],
+    }
+
+
+def extract_features_batch(songs, field="sanitized_lyrics", tokens=True):
+    """
+    Computes the simple lexical and character features of many songs at once.
+
+    The values equal those of the corresponding `features_lexical.get_*` functions, except
+    that songs for which those raise a ZeroDivisionError (e.g., empty lyrics) get NaN.
+    Computing the token features tokenizes the lyrics with NLTK, exactly as the per-song
+    path does; batches of a few thousand songs keep the intermediate arrays small.
+
+    Parameters
+    ----------
+    songs : list of dict
+        The song objects, as dictionaries.
+    field : str
+        The field holding the lyrics.
+    tokens : bool
+        Whether to compute the token features, too, or only the character features.
+
+    Returns
+    -------
+    names : list of str
+        The feature names, i.e., `CHARACTER_FEATURES` followed by `TOKEN_FEATURES` if `tokens`.
+    matrix : numpy.ndarray
+        The features, with one row per song and one float64 column per name.
+    """
+    texts = [song[field] for song in songs]
+    features, line_count = _character_features(texts)
+    names = list(CHARACTER_FEATURES)
+
+    if tokens:
+        features |= _token_features([SongAnalysis(text).tokens for text in texts], line_count)
+        names += TOKEN_FEATURES
+
+    matrix = np.empty((len(texts), len(names)))
+    for i, name in enumerate(names):
+        matrix[:, i] = features[name]
+
+    return names, matrix
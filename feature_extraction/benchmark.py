@@ -0,0 +1,376 @@
+"""
+Benchmarks for the feature extraction, run as `python -m feature_extraction.benchmark <benchmark>`.
+
+Available benchmarks:
+    imports     Time to import each feature module in a fresh interpreter, i.e., the startup
+                cost of a small job or of a spawned worker process.
+    rhymes      Rhyme detection with the precomputed phone index versus pronouncing.rhymes().
+    readability The readability formulas from shared text statistics versus textstat.
+    diversity   The lexical diversity indices from single-pass counts versus lexical_diversity and
+                lexicalrichness.
+    recompute   Checks that recomputing a feature family that fails for a song does not leave
+                the song's old features of that family in place.
+    sanitizer   Multiplier reduplication and annotation removal of `sanitizer` versus their
+                original definitions, on random lyrics.
+    batch       Character features of many songs with `extract_features_batch` versus the
+                per-song functions of `features_lexical`.
+"""
+
+import argparse
+import math
+import random
+import re
+import subprocess
+import sys
+import time
+
+_MODULES = [
+    "feature_extraction",
+    "feature_extraction.features_compression",
+    "feature_extraction.features_structure",
+    "feature_extraction.features_readability",
+    "feature_extraction.features_lexical",
+    "feature_extraction.features_linguistic",
+    "feature_extraction.features_rhyme",
+]
+
+_IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+_FIRST_USE_SCRIPT = """
+import time
+import feature_extraction.features_linguistic as fling
+start = time.perf_counter()
+fling.get_wordnet_words()
+print(time.perf_counter() - start)
+"""
+
+
+def _time_script(script, repeat):
+    # Every measurement runs in a fresh interpreter, so nothing is imported yet.
+    timings = [float(subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout)
+               for _ in range(repeat)]
+    return min(timings)
+
+
+def benchmark_imports(repeat=3):
+    """Prints the best of `repeat` import times of every feature module, in a fresh interpreter each."""
+    print(f"{'module':<45} {'seconds':>8}")
+    for module in _MODULES:
+        print(f"{module:<45} {_time_script(_IMPORT_SCRIPT.format(module=module), repeat):>8.3f}")
+
+    print(f"{'wiktionary lexicon (first use)':<45} {_time_script(_FIRST_USE_SCRIPT, repeat):>8.3f}")
+
+
+def benchmark_rhymes(pairs=2000, seed=42):
+    """
+    Compares `features_rhyme._do_rhyme` with its original definition on random word pairs.
+
+    Half of the pairs are drawn from words sharing a rhyming part, the other half are random
+    dictionary words, some of them capitalized. Raises an AssertionError if the results differ.
+    """
+    import pronouncing
+    from . import features_rhyme as frhyme
+
+    pronouncing.init_cmu()
+    rng = random.Random(seed)
+    words = sorted(pronouncing.lookup)
+    rhyme_groups = [group for group in pronouncing.rhyme_lookup.values() if len(group) > 1]
+
+    word_pairs = []
+    for _ in range(pairs // 2):
+        word_pairs.append(tuple(rng.sample(rng.choice(rhyme_groups), 2)))
+        a, b = rng.choice(words), rng.choice(words)
+        word_pairs.append((a, b.capitalize() if rng.random() < 0.2 else b))
+
+    start = time.perf_counter()
+    expected = [a in pronouncing.rhymes(b) or a == b for a, b in word_pairs]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frhyme._get_phone_index()
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [frhyme._do_rhyme(a, b) for a, b in word_pairs]
+    lookup_time = time.perf_counter() - start
+
+    assert actual == expected, "phone index differs from pronouncing.rhymes()"
+
+    print(f"{len(word_pairs)} word pairs, {sum(expected)} rhyming")
+    print(f"{'pronouncing.rhymes()':<30} {reference_time:>8.3f} s")
+    print(f"{'phone index (build)':<30} {index_time:>8.3f} s")
+    print(f"{'phone index (lookups)':<30} {lookup_time:>8.3f} s")
+
+
+_READABILITY_FORMULAS = [
+    "flesch_reading_ease", "smog_index", "flesch_kincaid_grade", "automated_readability_index",
+    "coleman_liau_index", "dale_chall_readability_score", "difficult_words", "linsear_write_formula",
+    "gunning_fog", "text_standard", "fernandez_huerta", "szigriszt_pazos", "gutierrez_polini", "crawford",
+]
+
+
+def benchmark_readability(songs=500, seed=42):
+    """
+    Compares the readability formulas of `features_readability` with textstat on random lyrics.
+
+    The lyrics are built from the words of textstat's easy word list and a few longer words,
+    with punctuation and line breaks. Raises an AssertionError if any value differs.
+    """
+    import textstat
+    from . import features_readability as fread
+
+    rng = random.Random(seed)
+    words = sorted(fread.get_easy_words())[:2000] + ["extraordinary", "generation", "beautiful", "don't", "rock'n'roll"]
+    separators = [" "] * 8 + ["\n", "\n\n", ". ", "! ", "? ", ", "]
+    lyrics = ["".join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(50, 400)))
+              for _ in range(songs)]
+
+    start = time.perf_counter()
+    expected = [[getattr(textstat, formula)(text) for formula in _READABILITY_FORMULAS] for text in lyrics]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    statistics = [fread.ReadabilityStatistics(text) for text in lyrics]
+    actual = [[getattr(song, formula)() for formula in _READABILITY_FORMULAS] for song in statistics]
+    engine_time = time.perf_counter() - start
+
+    assert actual == expected, "readability statistics differ from textstat"
+
+    print(f"{songs} songs, {len(_READABILITY_FORMULAS)} formulas")
+    print(f"{'textstat':<30} {reference_time:>8.3f} s")
+    print(f"{'ReadabilityStatistics':<30} {engine_time:>8.3f} s")
+
+
+def benchmark_diversity(songs=500, seed=42):
+    """
+    Compares the diversity indices of `DiversityStatistics` with lexical_diversity and lexicalrichness.
+
+    The lyrics are random sequences of a few hundred words. Raises an AssertionError if any value differs.
+    """
+    from lexical_diversity import lex_div as ld
+    from lexicalrichness import LexicalRichness
+    from .diversity import DiversityStatistics, richness_tokenize
+
+    rng = random.Random(seed)
+    # lexicalrichness drops digits, so the words are made of letters only.
+    words = ["".join(rng.choices("abcdefghij", k=rng.randint(2, 6))) for _ in range(300)]
+    words += ["la", "na", "ooh", "yeah", "don't", "rock-n-roll", "1st"]
+    lyrics = [" ".join(rng.choice(words[:rng.randint(20, len(words))]) for _ in range(rng.randint(50, 400)))
+              for _ in range(songs)]
+    tokens = [text.split() for text in lyrics]
+
+    start = time.perf_counter()
+    expected = []
+    for text, song_tokens in zip(lyrics, tokens):
+        richness = LexicalRichness(text)
+        expected.append([ld.mtld(song_tokens), richness.Herdan, richness.Summer, richness.Dugast, richness.Maas])
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = []
+    for text, song_tokens in zip(lyrics, tokens):
+        statistics = DiversityStatistics(song_tokens)
+        richness = DiversityStatistics(richness_tokenize(text))
+        actual.append([statistics.mtld(), richness.herdan(), richness.summer(), richness.dugast(), richness.maas()])
+    engine_time = time.perf_counter() - start
+
+    assert actual == expected, "diversity indices differ from lexical_diversity and lexicalrichness"
+
+    print(f"{songs} songs, 5 indices")
+    print(f"{'lexical_diversity + LexicalRichness':<36} {reference_time:>8.3f} s")
+    print(f"{'DiversityStatistics':<36} {engine_time:>8.3f} s")
+
+
+def check_recompute():
+    """
+    Checks that `extract_and_add_features` with `families` replaces the selected families' features.
+
+    A song with (stale) features of all families has its structure features recomputed, once
+    successfully and once failing. Raises an AssertionError if a family's features in the
+    registry differ from the feature table columns, or if the failing recomputation leaves
+    old structure features in place or touches the features of other families.
+    """
+    from . import extract_and_add_features
+    from .columnar import FEATURE_COLUMNS
+    from .registry import FAMILIES
+
+    assert [name for family in FAMILIES.values() for name in family.features] == list(FEATURE_COLUMNS), \
+        "the features of the families differ from the feature table columns"
+
+    structure_features = FAMILIES["structure"].features
+    stale_features = dict.fromkeys(FEATURE_COLUMNS, -42)
+    lyrics = "[Verse 1]\nhello there my old friend\n\n[Chorus]\nla la la\nla la la\n"
+
+    song = {"_id": {"artist": "a", "track": "hello"}, "lyrics": lyrics,
+            "sanitized_lyrics": "hello there my old friend\nla la la\nla la la", "features": dict(stale_features)}
+    assert extract_and_add_features(song, families=["structure"])
+    assert all(song["features"][name] != -42 for name in structure_features), "structure features were not recomputed"
+
+    # Unannotated lyrics that are not a string make the structure features fail.
+    song = dict(song, lyrics=None, features=dict(stale_features))
+    assert not extract_and_add_features(song, families=["structure"])
+    assert song["features"].keys() == stale_features.keys()
+    assert all(song["features"][name] is None for name in structure_features), "stale structure features were kept"
+    assert all(value == -42 for name, value in song["features"].items() if name not in structure_features), \
+        "features of other families were changed"
+
+    print("recomputing a failing family marks its features as failed")
+
+
+# The original definitions of `sanitizer.reduplicate_segment` and of the annotation removal,
+# which the sanitizer's output must stay identical to, byte for byte.
+def _reference_reduplicate_segment(text):
+    sanitized_text = ""
+    lines = text.split("\n")
+    for line in lines:
+        if match := re.match(r"(?P<text>[^\[\n]+)\[x(?P<number>[0-9]+)\]", line):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n") * number
+        elif match := re.match(r"(?P<text>[^\[\n]+)\[(?P<number>[0-9]+)x\]", line):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n") * number
+        else:
+            sanitized_text += line + "\n"
+
+    paragraphs = sanitized_text.split("\n\n")
+    sanitized_text = ""
+    for paragraph in paragraphs:
+        if match := re.match(r"(?s)^\[(?P<number>[0-9]+)x\]\n(?P<text>.*)", paragraph):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n\n") * number
+        elif match := re.match(r"(?s)^\[x(?P<number>[0-9]+)\]\n(?P<text>.*)", paragraph):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n\n") * number
+        elif match := re.match(r"(?s)(?P<text>.*)\[(?P<number>[0-9]+)x\]$", paragraph):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n\n") * number
+        elif match := re.match(r"(?s)(?P<text>.*)\[x(?P<number>[0-9]+)\]$", paragraph):
+            text = match.group("text")
+            number = int(match.group("number"))
+            sanitized_text += (text + "\n\n") * number
+        else:
+            sanitized_text += paragraph + "\n\n"
+
+    return sanitized_text
+
+
+def _reference_remove_annotations(text, keywords):
+    for keyword in keywords:
+        text = re.sub(r"(?i)\[.*" + keyword + r".*\]", "", text)
+    return text
+
+
+_LYRICS_PIECES = ["[", "]", "[Verse 1]", "[CHORUS]", "[x2]", "[2x]", "[3x]", "[x12]", "[?x]", "verse", "SOLO",
+                  "guitar solo", "HooK", "\n", "\n\n", " ", "la", "la la", "love ", "[Intro: Bob]", "[Spoken]",
+                  "[Instrumental]", "[Drop", "]]", "x", "2", "(", "Refrain", "[Pre-Chorus]", "[Bridge x2]",
+                  "\n[x2]\n", "\n[2x]", "[x3]\n"]
+
+
+def benchmark_sanitizer(songs=20000, seed=42):
+    """
+    Compares `reduplicate_segment` and the annotation removal of `sanitizer` with their original
+    definitions on random lyrics made of multipliers, annotations, keywords and line breaks.
+
+    Raises an AssertionError if any output differs.
+    """
+    import sanitizer
+
+    rng = random.Random(seed)
+    lyrics = ["".join(rng.choice(_LYRICS_PIECES) for _ in range(rng.randint(0, 60))) for _ in range(songs)]
+
+    start = time.perf_counter()
+    expected_reduplicated = [_reference_reduplicate_segment(text) for text in lyrics]
+    expected_removed = [_reference_remove_annotations(_reference_remove_annotations(text, sanitizer.INSTRUMENT_KEYWORDS),
+                                                      sanitizer.STRUCTURE_KEYWORDS) for text in lyrics]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reduplicated = [sanitizer.reduplicate_segment(text) for text in lyrics]
+    removed = [sanitizer.remove_annotations(text, sanitizer.annotation_keyword_pattern) for text in lyrics]
+    sanitizer_time = time.perf_counter() - start
+
+    assert reduplicated == expected_reduplicated, "reduplicate_segment differs from its original definition"
+    assert removed == expected_removed, "remove_annotations differs from the original annotation removal"
+    assert all(sanitizer.remove_song_structure_annotations(text)
+               == _reference_remove_annotations(text, sanitizer.STRUCTURE_KEYWORDS) for text in lyrics), \
+        "remove_song_structure_annotations differs from its original definition"
+    assert all(sanitizer.remove_instrument_annotations(text)
+               == _reference_remove_annotations(text, sanitizer.INSTRUMENT_KEYWORDS) for text in lyrics), \
+        "remove_instrument_annotations differs from its original definition"
+
+    print(f"{songs} lyrics")
+    print(f"{'original definitions':<30} {reference_time:>8.3f} s")
+    print(f"{'sanitizer':<30} {sanitizer_time:>8.3f} s")
+
+
+def benchmark_batch(songs=5000, seed=42):
+    """
+    Compares `batch.extract_features_batch` with the per-song lexical functions on random lyrics.
+
+    Raises an AssertionError if the results differ.
+    """
+    from . import features_lexical as flex
+    from .batch import CHARACTER_FEATURES, extract_features_batch
+
+    rng = random.Random(seed)
+    alphabet = "abcdefghij klmnop 0123 !?:;\",.-()\n\n\u0663\u00e9"
+    lyrics = [{"sanitized_lyrics": "".join(rng.choices(alphabet, k=rng.randint(200, 3000)))} for _ in range(songs)]
+
+    def get(feature, text):
+        try:
+            return getattr(flex, "get_" + feature)(text)
+        except ZeroDivisionError:
+            return math.nan
+
+    start = time.perf_counter()
+    expected = [[get(feature, song["sanitized_lyrics"]) for feature in CHARACTER_FEATURES] for song in lyrics]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    names, matrix = extract_features_batch(lyrics, tokens=False)
+    batch_time = time.perf_counter() - start
+
+    assert names == CHARACTER_FEATURES
+    assert all(a == e or (math.isnan(a) and math.isnan(e))
+               for row, expected_row in zip(matrix.tolist(), expected) for a, e in zip(row, expected_row)), \
+        "extract_features_batch differs from the per-song functions"
+
+    print(f"{songs} songs, {len(CHARACTER_FEATURES)} features")
+    print(f"{'per-song functions':<30} {reference_time:>8.3f} s")
+    print(f"{'extract_features_batch()':<30} {batch_time:>8.3f} s")
+
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Benchmarks for the feature extraction.")
+    parser.add_argument("benchmark", choices=["imports", "rhymes", "readability", "diversity", "sanitizer", "recompute", "batch"], help="The benchmark to run.")
+    parser.add_argument("--repeat", dest="repeat", type=int, default=None, help="Number of repetitions of the imports benchmark (default: 3); the best time is reported.")
+    args = parser.parse_args()
+
+    if args.repeat is not None and args.benchmark != "imports":
+        parser.error("--repeat only applies to the imports benchmark.")
+
+    if args.benchmark == "imports":
+        benchmark_imports(args.repeat or 3)
+    elif args.benchmark == "rhymes":
+        benchmark_rhymes()
+    elif args.benchmark == "readability":
+        benchmark_readability()
+    elif args.benchmark == "diversity":
+        benchmark_diversity()
+    elif args.benchmark == "sanitizer":
+        benchmark_sanitizer()
+    elif args.benchmark == "recompute":
+        check_recompute()
+    elif args.benchmark == "batch":
+        benchmark_batch()
@@ -0,0 +1,105 @@
+"""
+Bounded least-recently-used caches with hit, miss and memory counters.
+"""
+
+import sys
+from collections import OrderedDict
+from functools import wraps
+
+_caches = []
+
+
+class BoundedCache:
+    """
+    A least-recently-used cache that is bounded by number of entries and by memory.
+
+    Entries are evicted once the cache holds more than `max_entries` entries or once its
+    keys take more than `max_bytes` bytes. Since our caches are keyed by lyrics or tokens,
+    the keys make up most of the memory held alive by an entry.
+
+    Parameters
+    ----------
+    name : str
+        Name of the cache, as reported by `cache_stats`.
+    max_entries : int
+        Maximum number of entries.
+    max_bytes : int or None
+        Maximum total size of all keys, in bytes, or None for no limit.
+    """
+
+    def __init__(self, name, max_entries, max_bytes=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        _caches.append(self)
+
+    def get(self, key, compute):
+        """Returns the cached value for `key`, calling `compute(key)` to create it on a miss."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        value = compute(key)
+        self._entries[key] = value
+        self._bytes += sys.getsizeof(key)
+
+        while len(self._entries) > self.max_entries or \
+                (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1):
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._bytes -= sys.getsizeof(evicted_key)
+            self.evictions += 1
+
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        """Returns the counters of this cache as a dictionary."""
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+def cached(cache):
+    """Decorator that caches a function of a single hashable argument in the given `BoundedCache`."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(key):
+            return cache.get(key, function)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cache_stats():
+    """
+    Returns the counters of all caches of the feature extraction in this process.
+
+    Returns
+    -------
+    list of dict
+        For every cache, its name, hits, misses, evictions, number of entries, and the
+        total size of its keys in bytes.
+    """
+    return [cache.stats() for cache in _caches]
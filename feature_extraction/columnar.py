@@ -0,0 +1,194 @@
+"""
+Writes computed features to a typed, columnar Parquet file instead of song objects.
+
+Every feature gets its own float32 or int32 column, next to the id, genre and release date
+of the song, so that an analysis can read (or memory-map) exactly the columns it needs
+instead of normalizing the nested song objects of the whole corpus. Requires pyarrow.
+"""
+
+from datetime import datetime
+
+# The features computed by `extract_and_add_features` and the types of their columns.
+# `FeatureTableWriter` rejects songs whose features differ from these, so that a feature
+# added to (or renamed in) the extraction cannot silently go missing from the table.
+FEATURE_COLUMNS = {
+    'compression_ratio': 'float32',
+    'readability_flesch_kincaid_grade': 'float32',
+    'readability_flesch_reading_ease': 'float32',
+    'readability_smog': 'float32',
+    'readability_automated_readability_index': 'float32',
+    'readability_coleman_liau_index': 'float32',
+    'readability_dale_chall_readability_score': 'float32',
+    'readability_difficult_words': 'int32',
+    'readability_linsear_write_formula': 'float32',
+    'readability_gunning_fog': 'float32',
+    'readability_fernandez_huerta': 'float32',
+    'readability_szigriszt_pazos': 'float32',
+    'readability_gutierrez_polini': 'float32',
+    'readability_crawford': 'float32',
+    'token_count': 'int32',
+    'character_count': 'int32',
+    'repeated_token_ratio': 'float32',
+    'unique_tokens_per_line': 'float32',
+    'average_token_length': 'float32',
+    'average_tokens_per_line': 'float32',
+    'line_count': 'int32',
+    'unique_line_count': 'int32',
+    'blank_line_count': 'int32',
+    'blank_line_ratio': 'float32',
+    'repeated_line_ratio': 'float32',
+    'exclamation_mark_count': 'int32',
+    'question_mark_count': 'int32',
+    'digit_count': 'int32',
+    'colon_count': 'int32',
+    'semicolon_count': 'int32',
+    'quote_count': 'int32',
+    'comma_count': 'int32',
+    'dot_count': 'int32',
+    'hyphen_count': 'int32',
+    'parens_count': 'int32',
+    'punctuation_count': 'int32',
+    'digit_ratio': 'float32',
+    'punctuation_ratio': 'float32',
+    'stop_word_count': 'int32',
+    'stop_word_ratio': 'float32',
+    'stop_words_per_line': 'float32',
+    'unique_bigram_ratio': 'float32',
+    'unique_trigram_ratio': 'float32',
+    'hapax_legomenon_ratio': 'float32',
+    'dis_legomenon_ratio': 'float32',
+    'tris_legomenon_ratio': 'float32',
+    'mtld': 'float32',
+    'herdan': 'float32',
+    'summer': 'float32',
+    'dugast': 'float32',
+    'maas': 'float32',
+    'pronoun_frequency': 'float32',
+    'past_tense_ratio': 'float32',
+    'adjective_frequency': 'float32',
+    'adverb_frequency': 'float32',
+    'noun_frequency': 'float32',
+    'verb_frequency': 'float32',
+    'uncommon_words_ratio': 'float32',
+    'title_occurences': 'int32',
+    'number_of_sections': 'int32',
+    'number_of_verses': 'int32',
+    'starts_with_chorus': 'int32',
+    'relation_verses_sections': 'float32',
+    'relation_chorus_sections': 'float32',
+    'ends_with_two_chorus_repetitions': 'int32',
+    'pattern_verse_chorus_alternating': 'int32',
+    'pattern_two_verses_at_least_one_chorus': 'int32',
+    'pattern_two_choruses_at_least_one_verse': 'int32',
+    'num_couplets': 'int32',
+    'num_clerihews': 'int32',
+    'num_alternating': 'int32',
+    'num_nested': 'int32',
+    'alliterations_len_2': 'int32',
+    'alliterations_len_3': 'int32',
+    'alliterations_len_4_plus': 'int32',
+    'rhyme_percent': 'float32',
+    'unique_rhyme_words': 'int32',
+}
+
+
+def is_parquet(path):
+    """Returns True if the given path names a Parquet file."""
+    return str(path).endswith(".parquet")
+
+
+def parse_release(release):
+    """
+    Returns the release date of a song as milliseconds since the epoch (UTC), or None.
+
+    Release dates are stored in MongoDB's extended JSON, i.e., as {"$date": "<ISO 8601>"}
+    or, for dates before 1970, as {"$date": {"$numberLong": "<milliseconds>"}}.
+    """
+    if not isinstance(release, dict) or "$date" not in release:
+        return None
+
+    date = release["$date"]
+    try:
+        if isinstance(date, dict):
+            return int(date["$numberLong"])
+        timestamp = datetime.fromisoformat(date.replace("Z", "+00:00")).timestamp()
+        return round(timestamp * 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class FeatureTableWriter:
+    """
+    Streams the features of song objects into a Parquet file.
+
+    Every song passed to `write` becomes one row: its artist, track, genre and release date,
+    and one column per feature in `FEATURE_COLUMNS`. Songs without features, i.e., whose
+    extraction failed, have null features, as do features set to None because their
+    recomputation failed. Rows are buffered and written as a row group every `batch_size`
+    songs. Can be used as a context manager.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Parquet file to create.
+    batch_size : int
+        The number of songs per row group.
+    """
+
+    def __init__(self, path, batch_size=10_000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._schema = pa.schema(
+            [("artist", pa.string()), ("track", pa.string()), ("genre", pa.string()),
+             ("release", pa.timestamp("ms", tz="UTC"))]
+            + [(name, pa.from_numpy_dtype(type_)) for name, type_ in FEATURE_COLUMNS.items()])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch_size = batch_size
+        self._columns = {name: [] for name in self._schema.names}
+
+    def write(self, song):
+        """
+        Adds a song to the table.
+
+        Raises
+        ------
+        ValueError
+            If the song has features, but not exactly those of `FEATURE_COLUMNS`.
+        """
+        features = song.get('features', {})
+        if features and features.keys() != FEATURE_COLUMNS.keys():
+            unknown = sorted(features.keys() - FEATURE_COLUMNS.keys())
+            missing = sorted(FEATURE_COLUMNS.keys() - features.keys())
+            raise ValueError(f"The features of {song['_id']} do not match the feature table columns "
+                             f"(unknown: {', '.join(unknown) or '-'}; missing: {', '.join(missing) or '-'}).")
+
+        self._columns["artist"].append(song['_id']['artist'])
+        self._columns["track"].append(song['_id']['track'])
+        self._columns["genre"].append(song.get('genre'))
+        self._columns["release"].append(parse_release(song.get('release')))
+        for name in FEATURE_COLUMNS:
+            self._columns[name].append(features.get(name))
+
+        if len(self._columns["artist"]) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered songs as a row group."""
+        import pyarrow as pa
+
+        if not self._columns["artist"]:
+            return
+
+        self._writer.write_table(pa.table(self._columns, schema=self._schema))
+        self._columns = {name: [] for name in self._schema.names}
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
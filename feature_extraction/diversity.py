@@ -0,0 +1,105 @@
+"""
+Lexical diversity indices of a token sequence, derived from counts taken in a single pass.
+
+`DiversityStatistics` streams the tokens once, counting the frequency of every type and the
+forward and backward MTLD factors at the same time, and evaluates every index on these counts.
+The values are exactly those of lexical_diversity 0.1.1 (`mtld`) and lexicalrichness 0.1.4
+(`Herdan`, `Summer`, `Dugast`, `Maas`), the versions in Pipfile.lock.
+"""
+
+import string
+from collections import Counter
+from math import log
+
+# MTLD closes a factor once its type-token ratio drops below this threshold...
+MTLD_THRESHOLD = .72
+# ...and the factor has at least this many tokens.
+MTLD_MIN_FACTOR_LENGTH = 10
+
+# lexicalrichness' tokenizer (applied after lowercasing) removes ASCII digits and
+# dashes and splits at whitespace and ASCII punctuation.
+_richness_table = str.maketrans({**{c: " " for c in string.punctuation},
+                                 **{c: None for c in string.digits + "-–—"}})
+
+
+def richness_tokenize(text):
+    """Returns the tokens of `text` as split by lexicalrichness' default preprocessor and tokenizer."""
+    return text.lower().translate(_richness_table).split()
+
+
+class _MTLDFactors:
+    # The MTLD factors of a token sequence, fed one token at a time.
+
+    def __init__(self):
+        self.factors = 0
+        self.types = set()
+        self.length = 0
+
+    def add(self, token):
+        self.types.add(token)
+        self.length += 1
+        if len(self.types) / self.length < MTLD_THRESHOLD and self.length >= MTLD_MIN_FACTOR_LENGTH:
+            self.factors += 1
+            self.types = set()
+            self.length = 0
+
+    def close(self, token):
+        # The last token always ends a (partial) factor, weighted by how far its
+        # type-token ratio has dropped towards the threshold.
+        self.types.add(token)
+        self.length += 1
+        return self.factors + (1 - len(self.types) / self.length) / (1 - MTLD_THRESHOLD)
+
+
+class DiversityStatistics:
+    """
+    The counts of a token sequence that the lexical diversity indices are based on, computed once.
+
+    Parameters
+    ----------
+    tokens : list of str
+        The tokens of the song.
+    """
+
+    def __init__(self, tokens):
+        frequencies = {}
+        forward, backward = _MTLDFactors(), _MTLDFactors()
+
+        # Every token is counted, and fed to the forward and backward MTLD, in one pass.
+        last = len(tokens) - 1
+        for i, token in enumerate(tokens):
+            frequencies[token] = frequencies.get(token, 0) + 1
+            if i < last:
+                forward.add(token)
+                backward.add(tokens[last - i])
+
+        self.tokens = len(tokens)
+        self.types = len(frequencies)
+        # Frequency -> number of types occurring that often.
+        self.spectrum = Counter(frequencies.values())
+        self.forward_factors = forward.close(tokens[-1]) if tokens else 0
+        self.backward_factors = backward.close(tokens[0]) if tokens else 0
+
+    def legomenon_ratio(self, n):
+        """The ratio of types occurring exactly `n` times among all types."""
+        return self.spectrum[n] / self.types
+
+    def mtld(self):
+        # Every token belongs to exactly one factor in either direction.
+        forward = self.tokens / self.forward_factors if self.forward_factors else 0
+        backward = self.tokens / self.backward_factors if self.backward_factors else 0
+        return (forward + backward) / 2
+
+    def herdan(self):
+        return log(self.types) / log(self.tokens)
+
+    def summer(self):
+        return log(log(self.types)) / log(log(self.tokens))
+
+    def dugast(self):
+        if self.tokens == self.types:
+            raise ZeroDivisionError('Word count and term counts are the same.')
+        return (log(self.tokens) ** 2) / (log(self.tokens) - log(self.types))
+
+    def maas(self):
+        return (log(self.tokens) - log(self.types)) / (log(self.tokens) ** 2)
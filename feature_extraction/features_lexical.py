@@ -1,31 +1,30 @@
 """ 
 Computes lexical features for given lyrics.
+
+All functions accept either the lyrics as a string or a SongAnalysis of them.
 """
 
 from collections import Counter
-from functools import lru_cache
 
-from nltk.tokenize import word_tokenize
-from nltk import pos_tag
-from nltk.corpus import stopwords
-from nltk.util import ngrams
-from lexical_diversity import lex_div as ld
-from lexicalrichness import LexicalRichness
+from .analysis import SongAnalysis
+from .token_attributes import get_stop_words, get_token_attributes
+from .vocabulary import unique_ngram_ratio
 
 
-@lru_cache
 def get_tokens(text):
-    return word_tokenize(text)
+    return SongAnalysis.of(text).tokens
+
+
+def get_diversity_statistics(text):
+    return SongAnalysis.of(text).diversity
 
 
-@lru_cache
-def get_lexical_richness_object(text):
-    return LexicalRichness(text)
+def get_richness_diversity_statistics(text):
+    return SongAnalysis.of(text).richness_diversity
 
 
-@lru_cache
 def get_pos_tags(text):
-    return pos_tag(get_tokens(text))
+    return SongAnalysis.of(text).pos_tags
 
 
 def get_token_count(text):
@@ -33,7 +32,7 @@ def get_token_count(text):
 
 
 def get_character_count(text):
-    return len(text)
+    return len(SongAnalysis.of(text).text)
 
 
 def get_repeated_token_ratio(text):
@@ -41,9 +40,7 @@ def get_repeated_token_ratio(text):
 
 
 def get_unique_tokens_per_line(text):
-    tokens = get_tokens(text)
-    unique_tokens = len(list(set(tokens)))
-    
+    unique_tokens = get_diversity_statistics(text).types
     return unique_tokens / get_line_count(text)
 
 
@@ -57,16 +54,16 @@ def get_average_tokens_per_line(text):
 
 
 def get_line_count(text):
-    return text.count('\n') + 1
+    return SongAnalysis.of(text).text.count('\n') + 1
 
 
 def get_unique_line_count(text):
-    lines = text.split('\n')
+    lines = SongAnalysis.of(text).lines
     return len(list(set(lines)))
 
 
 def get_blank_line_count(text):
-    return text.count('\n\n')
+    return SongAnalysis.of(text).text.count('\n\n')
 
 
 def get_blank_line_ratio(text):
@@ -74,62 +71,85 @@ def get_blank_line_ratio(text):
 
 
 def get_repeated_line_ratio(text):
-    lines = text.split('\n')
+    lines = SongAnalysis.of(text).lines
     repeated_lines = filter(lambda elem: elem[1] > 1, Counter(lines).items())
 
     return len(dict(repeated_lines))/len(lines)
 
 
+# Punctuation characters counted by the lexical features.
+_PUNCTUATION_CLASSES = {
+    'exclamation_mark': '!',
+    'question_mark': '?',
+    'colon': ':',
+    'semicolon': ';',
+    'quote': '"',
+    'comma': ',',
+    'dot': '.',
+    'hyphen': '-',
+    'parens': '()',
+}
+
+
+def get_character_class_counts(text):
+    """
+    Returns the counts of all character classes used by the lexical features at once.
+
+    All counts are derived from a single pass over the lyrics (see `SongAnalysis.character_counts`).
+    The keys are the names of the punctuation classes (e.g., 'comma' or 'parens'),
+    'punctuation' for their sum, and 'digit'.
+    """
+    counts = SongAnalysis.of(text).character_counts
+
+    class_counts = {name: sum(counts[c] for c in characters) for name, characters in _PUNCTUATION_CLASSES.items()}
+    class_counts['punctuation'] = sum(class_counts.values())
+    class_counts['digit'] = sum(count for c, count in counts.items() if c.isdigit())
+
+    return class_counts
+
+
 def get_exclamation_mark_count(text):
-    return text.count('!')
+    return get_character_class_counts(text)['exclamation_mark']
 
 
 def get_question_mark_count(text):
-    return text.count('?')
+    return get_character_class_counts(text)['question_mark']
 
 
 def get_digit_count(text):
-    return len([character for character in text if character.isdigit()])
+    return get_character_class_counts(text)['digit']
 
 
 def get_colon_count(text):
-    return text.count(':')
+    return get_character_class_counts(text)['colon']
 
 
 def get_semicolon_count(text):
-    return text.count(';')
+    return get_character_class_counts(text)['semicolon']
 
 
 def get_quote_count(text):
-    return text.count('"')
+    return get_character_class_counts(text)['quote']
 
 
 def get_comma_count(text):
-    return text.count(',')
+    return get_character_class_counts(text)['comma']
 
 
 def get_dot_count(text):
-    return text.count('.')
+    return get_character_class_counts(text)['dot']
 
 
 def get_hyphen_count(text):
-    return text.count('-')
+    return get_character_class_counts(text)['hyphen']
 
 
 def get_parens_count(text):
-    return text.count('(') + text.count(')')
+    return get_character_class_counts(text)['parens']
 
 
 def get_punctuation_count(text):
-    return get_exclamation_mark_count(text) + \
-        get_question_mark_count(text) + \
-        get_colon_count(text) + \
-        get_semicolon_count(text) + \
-        get_quote_count(text) + \
-        get_comma_count(text) + \
-        get_dot_count(text) + \
-        get_hyphen_count(text) + \
-        get_parens_count(text)
+    return get_character_class_counts(text)['punctuation']
 
 
 def get_digit_ratio(text):
@@ -140,11 +160,16 @@ def get_punctuation_ratio(text):
     return get_punctuation_count(text) / get_character_count(text)
 
 
+def is_stop_word(token):
+    attributes = get_token_attributes(token)
+    if attributes is not None:
+        return attributes.is_stop_word
+    return token.lower() in get_stop_words()
+
+
 def get_stop_word_count(text):
     tokens = get_tokens(text)
-    stop_words = set(stopwords.words('english'))
-
-    return len([token for token in tokens if token.lower() in stop_words])
+    return len([token for token in tokens if is_stop_word(token)])
 
 
 def get_stop_word_ratio(text):
@@ -155,85 +180,84 @@ def get_stop_words_per_line(text):
     return get_stop_word_count(text) / get_line_count(text)
 
 
+def get_unique_ngram_ratio(text, n):
+    return unique_ngram_ratio(SongAnalysis.of(text).split_token_ids, n)
+
+
 def get_unique_bigram_ratio(text):
-    bigrams = list(ngrams(text.split(), 2))
-    unique_bigrams = set(bigrams)
+    return get_unique_ngram_ratio(text, 2)
 
-    return len(unique_bigrams) / len(bigrams)
-    
 
 def get_unique_trigram_ratio(text):
-    trigrams = list(ngrams(text.split(), 3))
-    unique_trigrams = set(trigrams)
-
-    return len(unique_trigrams) / len(trigrams)
+    return get_unique_ngram_ratio(text, 3)
 
 
 def get_legomenon_ratio(text, n):
-    tokens = get_tokens(text)
-    counter = Counter(tokens)
-
-    return len([i for i in counter.items() if i[1] == n]) / len(counter)
+    return get_diversity_statistics(text).legomenon_ratio(n)
 
 
 def get_mtld(text):
-    tokens = get_tokens(text)
-    return ld.mtld(tokens)
+    return get_diversity_statistics(text).mtld()
 
 
+# Herdan, Summer, Dugast and Maas are computed on lexicalrichness' tokenization.
 def get_herdan(text):
-    richness = get_lexical_richness_object(text)
-    return richness.Herdan
+    return get_richness_diversity_statistics(text).herdan()
 
 
 def get_summer(text):
-    richness = get_lexical_richness_object(text)
-    return richness.Summer
+    return get_richness_diversity_statistics(text).summer()
 
 
 def get_dugast(text):
-    richness = get_lexical_richness_object(text)
-    return richness.Dugast
+    return get_richness_diversity_statistics(text).dugast()
 
 
 def get_maas(text):
-    richness = get_lexical_richness_object(text)
-    return richness.Maas
+    return get_richness_diversity_statistics(text).maas()
+
+
+def get_pos_tag_counts(text):
+    return SongAnalysis.of(text).pos_tag_counts
+
+
+def _count_tags(tag_counts, prefix):
+    return sum(count for tag, count in tag_counts.items() if tag.startswith(prefix))
 
 
 def get_pronoun_frequency(text):
-    tags = get_pos_tags(text)
+    tag_counts = get_pos_tag_counts(text)
 
     # We define pronoun frequency as the ratio
     # of personal/possessive pronouns among all tokens.
-    return len([t for t in tags if t[1] in ("PRP", "PRP$")]) / len(tags)
+    return (tag_counts["PRP"] + tag_counts["PRP$"]) / sum(tag_counts.values())
 
 
 def get_past_tense_ratio(text):
-    tags = get_pos_tags(text)
+    tag_counts = get_pos_tag_counts(text)
 
     # We define the past tense ratio as the ratio
     # of verbs in past tense among all verbs.
-    all_verbs = [t for t in tags if t[1].startswith("V")]
-    past_verbs = [t for t in tags if t[1] in ("VBD", "VBN")]
+    all_verbs = _count_tags(tag_counts, "V")
+    past_verbs = tag_counts["VBD"] + tag_counts["VBN"]
 
-    if len(all_verbs) == 0:
+    if all_verbs == 0:
         return 0.0
         
-    return len(past_verbs) / len(all_verbs)
+    return past_verbs / all_verbs
 
 def get_adjective_frequency(text):
-    tags = get_pos_tags(text)
-    return len([t for t in tags if t[1].startswith("JJ")]) / len(tags)
+    tag_counts = get_pos_tag_counts(text)
+    return _count_tags(tag_counts, "JJ") / sum(tag_counts.values())
 
 def get_adverb_frequency(text):
-    tags = get_pos_tags(text)
-    return len([t for t in tags if t[1].startswith("RB")]) / len(tags)
+    tag_counts = get_pos_tag_counts(text)
+    return _count_tags(tag_counts, "RB") / sum(tag_counts.values())
 
 def get_noun_frequency(text):
-    tags = get_pos_tags(text)
-    return len([t for t in tags if t[1].startswith("N")]) / len(tags)
+    tag_counts = get_pos_tag_counts(text)
+    return _count_tags(tag_counts, "N") / sum(tag_counts.values())
 
 def get_verb_frequency(text):
-    tags = get_pos_tags(text)
-    return len([t for t in tags if t[1].startswith("V")]) / len(tags)
+    tag_counts = get_pos_tag_counts(text)
+    return _count_tags(tag_counts, "V") / sum(tag_counts.values())
@@ -2,32 +2,67 @@
 Computes linguistic features for given lyrics.
 """
 
-import json
-from functools import cache
+import os
 
-from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 
-# Initialize.
-lemmatizer = WordNetLemmatizer()
+from .analysis import SongAnalysis
+from .cache import BoundedCache, cached
+from .lexicon import Lexicon, ensure_lexicon
+from .token_attributes import get_token_attributes
 
 # Initialize.
 lemmatizer = WordNetLemmatizer()
 
-wordnet_words = set([".", ",", "(", ")", "-"])
-with open("./data/wiktionary_english.json", encoding="utf-8") as f:
-    for line in f:
-        word = json.loads(line)
-        wordnet_words.add(word["word"])
+extra_words = {".", ",", "(", ")", "-"}
+_wordnet_words = None
+# The lexicon index opened by the worker processes of `parallel.extract_features`, which is
+# built before they are started (see `use_worker_lexicon`).
+_worker_lexicon_path = None
+
+
+def use_worker_lexicon(lexicon_path):
+    """
+    Makes this process open the given lexicon index instead of building the one of the data
+    directory when needed. Called by the initializer of the worker processes of
+    `parallel.extract_features`, which would otherwise each parse the whole wiktionary dump.
+    """
+    global _worker_lexicon_path
+    _worker_lexicon_path = lexicon_path
 
 
-@cache
+def get_wordnet_words():
+    """Returns the set of wiktionary headwords, loading it on first use."""
+    global _wordnet_words
+    if _wordnet_words is None:
+        # The wiktionary headwords are compiled into a compact index once, which is then
+        # memory-mapped by every process.
+        if _worker_lexicon_path is None:
+            lexicon_path = ensure_lexicon()
+        elif os.path.exists(_worker_lexicon_path):
+            lexicon_path = _worker_lexicon_path
+        else:
+            raise FileNotFoundError(f"The wiktionary lexicon {_worker_lexicon_path} does not exist. Worker processes "
+                                    f"do not build it; it must be built (see lexicon.ensure_lexicon) before they start.")
+        _wordnet_words = Lexicon(lexicon_path)
+
+    return _wordnet_words
+
+
+@cached(BoundedCache("linguistic.is_uncommon", max_entries=100_000))
 def is_uncommon(token):
-    return lemmatizer.lemmatize(token) not in wordnet_words
+    attributes = get_token_attributes(token)
+    if attributes is not None:
+        lemma, in_wiktionary = attributes.lemma, attributes.in_wiktionary
+    else:
+        lemma = lemmatizer.lemmatize(token)
+        in_wiktionary = lemma in get_wordnet_words()
+
+    return lemma not in extra_words and not in_wiktionary
 
 
 def get_uncommon_words_ratio(text):
-    tokens = word_tokenize(text)
+    tokens = SongAnalysis.of(text).tokens
     uncommon_count = 0
     for token in tokens:
         if is_uncommon(token):
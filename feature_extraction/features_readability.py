@@ -1,61 +1,292 @@
-""" 
+"""
 Extracts readability features for given text based on textstat package.
+
+Instead of calling textstat once per formula, which counts sentences, words and syllables
+again for every one of them, the counts are computed once per song (see
+`ReadabilityStatistics`) and every formula is evaluated on them exactly as textstat 0.7.3
+(the version in Pipfile.lock) does for English, with its default rounding. Syllables are
+counted once per distinct word and kept across songs, or looked up in the token table.
 """
 
+import math
+import re
+from collections import Counter
+from importlib.resources import files
+
 import textstat
 
+from .analysis import SongAnalysis
+from .cache import BoundedCache, cached
+from .token_attributes import get_token_attributes
+
+_easy_words = None
+
+
+def get_easy_words():
+    """Returns the Dale-Chall list of easy words shipped with textstat."""
+    global _easy_words
+    if _easy_words is None:
+        data = files("textstat").joinpath("resources/en/easy_words.txt").read_bytes()
+        _easy_words = {line.decode("utf-8").strip() for line in data.splitlines(keepends=True)}
+    return _easy_words
+
+
+@cached(BoundedCache("readability.syllable_count", max_entries=200_000))
+def syllable_count(word):
+    """Returns `textstat.syllable_count` of a single word, from the token table if it has the word."""
+    attributes = get_token_attributes(word)
+    if attributes is not None:
+        return attributes.syllables
+    return textstat.syllable_count(word)
+
+
+def _grade_suffix(grade):
+    return {11: 'th', 12: 'th', 13: 'th'}.get(grade % 100, {1: 'st', 2: 'nd', 3: 'rd'}.get(grade % 10, 'th'))
+
+
+def _legacy_round(number, points=0):
+    # textstat's rounding of (intermediate) results.
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+class ReadabilityStatistics:
+    """
+    The counts of a text that textstat's readability formulas are based on, computed once.
+
+    Parameters
+    ----------
+    text : str
+        The lyrics of the song.
+    """
+
+    def __init__(self, text):
+        # textstat counts syllables, characters and polysyllables over
+        # the whitespace separated words of the (lowercased) text.
+        words = text.split()
+        syllables = [syllable_count(word) for word in words]
+
+        self.syllables = sum(syllables)
+        self.polysyllables = sum(1 for count in syllables if count >= 3)
+        self.characters = sum(map(len, words))
+
+        # Words, and their letters, are counted after removing punctuation.
+        lexicon = textstat.remove_punctuation(text).split()
+        self.words = len(lexicon)
+        self.letters = sum(map(len, lexicon))
+
+        self.sentences = textstat.sentence_count(text)
+
+        # Difficult words are distinct words that are not easy, by their number of syllables.
+        easy_words = get_easy_words()
+        self.difficult_word_syllables = Counter(
+            syllable_count(word) for word in set(re.findall(r"[\w\='‘’]+", text.lower())) if word not in easy_words)
+
+        # The Linsear Write formula only considers the first 100 words.
+        first_words = words[:100]
+        self.linsear_easy_words = sum(1 for count in syllables[:100] if count < 3)
+        self.linsear_difficult_words = len(first_words) - self.linsear_easy_words
+        self.linsear_sentences = textstat.sentence_count(" ".join(first_words))
+
+    def difficult_words(self, syllable_threshold=2):
+        return sum(count for syllables, count in self.difficult_word_syllables.items()
+                   if syllables >= syllable_threshold)
+
+    def avg_sentence_length(self):
+        return _legacy_round(float(self.words / self.sentences), 1)
+
+    def avg_syllables_per_word(self):
+        try:
+            return _legacy_round(float(self.syllables) / float(self.words), 1)
+        except ZeroDivisionError:
+            return 0.0
+
+    def avg_letter_per_word(self):
+        try:
+            return _legacy_round(float(self.letters / self.words), 2)
+        except ZeroDivisionError:
+            return 0.0
+
+    def avg_sentence_per_word(self):
+        try:
+            return _legacy_round(float(self.sentences / self.words), 2)
+        except ZeroDivisionError:
+            return 0.0
+
+    def flesch_reading_ease(self):
+        flesch = 206.835 - float(1.015 * self.avg_sentence_length()) - float(84.6 * self.avg_syllables_per_word())
+        return _legacy_round(flesch, 2)
+
+    def flesch_kincaid_grade(self):
+        flesch = float(0.39 * self.avg_sentence_length()) + float(11.8 * self.avg_syllables_per_word()) - 15.59
+        return _legacy_round(flesch, 1)
+
+    def smog_index(self):
+        if self.sentences < 3:
+            return 0.0
+        smog = (1.043 * (30 * (self.polysyllables / self.sentences)) ** .5) + 3.1291
+        return _legacy_round(smog, 1)
+
+    def coleman_liau_index(self):
+        letters = _legacy_round(self.avg_letter_per_word() * 100, 2)
+        sentences = _legacy_round(self.avg_sentence_per_word() * 100, 2)
+        coleman = float((0.058 * letters) - (0.296 * sentences) - 15.8)
+        return _legacy_round(coleman, 2)
+
+    def automated_readability_index(self):
+        try:
+            a = float(self.characters) / float(self.words)
+            b = float(self.words) / float(self.sentences)
+        except ZeroDivisionError:
+            return 0.0
+        readability = (4.71 * _legacy_round(a, 2)) + (0.5 * _legacy_round(b, 2)) - 21.43
+        return _legacy_round(readability, 1)
+
+    def linsear_write_formula(self):
+        number = float((self.linsear_easy_words * 1 + self.linsear_difficult_words * 3) / self.linsear_sentences)
+        if number <= 20:
+            number -= 2
+        return number / 2
+
+    def dale_chall_readability_score(self):
+        easy_words = self.words - self.difficult_words(syllable_threshold=0)
+        try:
+            per_easy_words = float(easy_words) / float(self.words) * 100
+        except ZeroDivisionError:
+            return 0.0
+        per_difficult_words = 100 - per_easy_words
+        score = (0.1579 * per_difficult_words) + (0.0496 * self.avg_sentence_length())
+        if per_difficult_words > 5:
+            score += 3.6365
+        return _legacy_round(score, 2)
+
+    def gunning_fog(self):
+        try:
+            per_diff_words = self.difficult_words(syllable_threshold=3) / self.words * 100
+        except ZeroDivisionError:
+            return 0.0
+        grade = 0.4 * (self.avg_sentence_length() + per_diff_words)
+        return _legacy_round(grade, 2)
+
+    def fernandez_huerta(self):
+        f_huerta = 206.84 - float(60 * self.avg_syllables_per_word()) - float(1.02 * self.avg_sentence_length())
+        return _legacy_round(f_huerta, 2)
+
+    def szigriszt_pazos(self):
+        try:
+            s_p = 206.835 - 62.3 * (self.syllables / self.words) - (self.words / self.sentences)
+        except ZeroDivisionError:
+            return 0.0
+        return _legacy_round(s_p, 2)
+
+    def gutierrez_polini(self):
+        try:
+            gut_pol = 95.2 - 9.7 * (self.letters / self.words) - 0.35 * (self.words / self.sentences)
+        except ZeroDivisionError:
+            return 0.0
+        return _legacy_round(gut_pol, 2)
+
+    def crawford(self):
+        try:
+            sentences_per_words = 100 * (self.sentences / self.words)
+            syllables_per_words = 100 * (self.syllables / self.words)
+        except ZeroDivisionError:
+            return 0.0
+        craw_years = -0.205 * sentences_per_words + 0.049 * syllables_per_words - 3.407
+        return _legacy_round(craw_years, 1)
+
+    def text_standard(self):
+        grade = []
+
+        # Flesch Kincaid Grade.
+        score = self.flesch_kincaid_grade()
+        grade += [int(_legacy_round(score)), int(math.ceil(score))]
+
+        # Flesch Reading Ease.
+        score = self.flesch_reading_ease()
+        if 90 <= score < 100:
+            grade.append(5)
+        elif 80 <= score < 90:
+            grade.append(6)
+        elif 70 <= score < 80:
+            grade.append(7)
+        elif 60 <= score < 70:
+            grade += [8, 9]
+        elif 50 <= score < 60:
+            grade.append(10)
+        elif 40 <= score < 50:
+            grade.append(11)
+        elif 30 <= score < 40:
+            grade.append(12)
+        else:
+            grade.append(13)
+
+        # SMOG, Coleman-Liau, ARI, Dale-Chall, Linsear Write and Gunning Fog.
+        for score in [self.smog_index(), self.coleman_liau_index(), self.automated_readability_index(),
+                      self.dale_chall_readability_score(), self.linsear_write_formula(), self.gunning_fog()]:
+            grade += [int(_legacy_round(score)), int(math.ceil(score))]
+
+        # The consensus is the most common grade.
+        lower_score = int(Counter(grade).most_common(1)[0][0]) - 1
+        upper_score = lower_score + 1
+        return f"{lower_score}{_grade_suffix(lower_score)} and {upper_score}{_grade_suffix(upper_score)} grade"
+
+
+def get_readability_statistics(text):
+    return SongAnalysis.of(text).readability_statistics
+
 
 def get_flesch_reading_ease(text):
-    return textstat.flesch_reading_ease(text)
+    return get_readability_statistics(text).flesch_reading_ease()
 
 
 def get_smog(text):
-    return textstat.smog_index(text)
+    return get_readability_statistics(text).smog_index()
 
 
 def get_flesch_kincaid_grade(text):
-    return textstat.flesch_kincaid_grade(text)
+    return get_readability_statistics(text).flesch_kincaid_grade()
 
 
 def get_automated_readability_index(text):
-    return textstat.automated_readability_index(text)
+    return get_readability_statistics(text).automated_readability_index()
 
 
 def get_coleman_liau_index(text):
-    return textstat.coleman_liau_index(text)
+    return get_readability_statistics(text).coleman_liau_index()
 
 
 def get_dale_chall_readability_score(text):
-    return textstat.dale_chall_readability_score(text)
+    return get_readability_statistics(text).dale_chall_readability_score()
 
 
 def get_difficult_words(text):
-    return textstat.difficult_words(text)
+    return get_readability_statistics(text).difficult_words()
 
 
 def get_linsear_write_formula(text):
-    return textstat.linsear_write_formula(text)
+    return get_readability_statistics(text).linsear_write_formula()
 
 
 def get_gunning_fog(text):
-    return textstat.gunning_fog(text)
+    return get_readability_statistics(text).gunning_fog()
 
 
 def get_text_standard(text):
-    return textstat.text_standard(text)
+    return get_readability_statistics(text).text_standard()
 
 
 def get_fernandez_huerta(text):
-    return textstat.fernandez_huerta(text)
+    return get_readability_statistics(text).fernandez_huerta()
 
 
 def get_szigriszt_pazos(text):
-    return textstat.szigriszt_pazos(text)
+    return get_readability_statistics(text).szigriszt_pazos()
 
 
 def get_gutierrez_polini(text):
-    return textstat.gutierrez_polini(text)
+    return get_readability_statistics(text).gutierrez_polini()
 
 
 def get_crawford(text):
-    return textstat.crawford(text)
+    return get_readability_statistics(text).crawford()
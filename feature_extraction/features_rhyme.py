@@ -7,12 +7,56 @@ by Song Lyrics" by Mayer et al.
 import string
 from collections import defaultdict
 
-from nltk import word_tokenize
-from pronouncing import rhymes, phones_for_word
+import pronouncing
+
+from .analysis import SongAnalysis
+
+# pronouncing.rhymes() considers every pronunciation of a word since version 0.3,
+# and only its first pronunciation before.
+_RHYMES_USE_ALL_PRONUNCIATIONS = tuple(int(v) for v in pronouncing.__version__.split(".")[:2]) >= (0, 3)
+
+_NO_PHONES = frozenset()
+_phone_index = None
+
+
+def _get_phone_index():
+    """
+    Maps every word in the CMU dictionary to the rhyming part of its first pronunciation,
+    the set of rhyming parts of all its pronunciations, and the set of initial phones of
+    its pronunciations. Built in one pass over the dictionary, once per process.
+    """
+    global _phone_index
+    if _phone_index is None:
+        pronouncing.init_cmu()
+
+        rhyming_parts = defaultdict(list)
+        initial_phones = defaultdict(set)
+        for word, phones in pronouncing.pronunciations:
+            rhyming_parts[word].append(pronouncing.rhyming_part(phones))
+            initial_phones[word].add(phones.split(" ")[0])
+
+        _phone_index = {word: (parts[0], frozenset(parts), frozenset(initial_phones[word]))
+                        for word, parts in rhyming_parts.items()}
+
+    return _phone_index
 
 
 def _do_rhyme(a, b):
-        return a in rhymes(b) or a == b
+    # Equivalent to `a in pronouncing.rhymes(b) or a == b`, but instead of scanning
+    # the CMU dictionary for words rhyming with b, we compare rhyming parts. Note that
+    # rhymes() looks b up case-insensitively but only returns lowercase words.
+    if a == b:
+        return True
+
+    index = _get_phone_index()
+    a_parts = index.get(a)
+    b_parts = index.get(b.lower())
+    if a_parts is None or b_parts is None:
+        return False
+
+    if _RHYMES_USE_ALL_PRONUNCIATIONS:
+        return not a_parts[1].isdisjoint(b_parts[1])
+    return b_parts[0] in a_parts[1]
 
 
 def get_rhyme_features(text):
@@ -20,9 +64,8 @@ def get_rhyme_features(text):
 
     # The features we consider are line-wise, so to check for rhymes, 
     # we need to look at the last word of every line.
-    lines = text.split("\n") #ToDo: How do we handle paragraph breaks?
-    
-    line_tokens = [word_tokenize(l) for l in lines if l.strip() != ""]
+    # ToDo: How do we handle paragraph breaks?
+    line_tokens = SongAnalysis.of(text).line_tokens
     line_tokens = [list(filter(lambda t: t not in string.punctuation, l)) for l in line_tokens]
 
     # We will compute some general ryhme statistict that span several different types of rhymes.
@@ -95,30 +138,27 @@ def get_rhyme_features(text):
     res["num_alternating"] = num_alternating
     res["num_nested"] = num_nested
 
-    # Check for alliterations.
+    # Check for alliterations, i.e., runs of tokens sharing an initial phone with
+    # the first token of the run. A token that does not continue the current run
+    # starts the next one, so every line is scanned once.
+    index = _get_phone_index()
     num_alliterations = defaultdict(int)
     for tokens in line_tokens:
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-            token_initial_phones = set([p.split(" ")[0] for p in phones_for_word(token)])
-
-            # Check if there is an alliteration starting 
-            # from the current token.
-            seq_length = 1
-            for j in range(i + 1, len(tokens)):
-                next_token = tokens[j]
-                next_token_initial_phones = set([p.split(" ")[0] for p in phones_for_word(next_token)])
-
-                if len(token_initial_phones.intersection(next_token_initial_phones)) == 0:
-                    break
+        run_phones, seq_length = None, 0
+        for token in tokens:
+            entry = index.get(token.lower())
+            token_initial_phones = entry[2] if entry is not None else _NO_PHONES
 
+            if seq_length > 0 and not run_phones.isdisjoint(token_initial_phones):
                 seq_length += 1
+                continue
 
             if seq_length > 1:
                 num_alliterations[seq_length] += 1
+            run_phones, seq_length = token_initial_phones, 1
 
-            i += seq_length
+        if seq_length > 1:
+            num_alliterations[seq_length] += 1
 
     res["alliterations_len_2"] = num_alliterations[2]
     res["alliterations_len_3"] = num_alliterations[3]
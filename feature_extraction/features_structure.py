@@ -3,17 +3,17 @@ Computes structural features for given lyrics, based on
 "Emotionally-Relevant Features for Classification
 and Regression of Music Lyrics" by Malheiro et al.
 """
-from functools import lru_cache
 import re
 from . import segment_lyrics
+from .cache import BoundedCache, cached
 
-@lru_cache
+@cached(BoundedCache("structure.contains_annotations", max_entries=4, max_bytes=1_000_000))
 def contains_annotations(text: str):
     """checks whether lyrics contain annotations (boolean)"""
     decoration_pattern = re.compile(r"\[.*]")
     return decoration_pattern.search(text)
 
-@lru_cache
+@cached(BoundedCache("structure.song_structure", max_entries=4, max_bytes=1_000_000))
 def get_song_structure(text: str):
     """ returns the structure of a song (verses, chorus, etc.) as list of pairs """
     # only return structure, no need to return the actual contents
@@ -132,3 +132,70 @@ def get_two_choruses_at_least_one_verse(text):
     else:
         return -1
 
+
+STRUCTURE_FEATURES = ['number_of_sections', 'number_of_verses', 'starts_with_chorus', 'relation_verses_sections',
+                      'relation_chorus_sections', 'ends_with_two_chorus_repetitions',
+                      'pattern_verse_chorus_alternating', 'pattern_two_verses_at_least_one_chorus',
+                      'pattern_two_choruses_at_least_one_verse']
+
+def get_structure_features(text, title):
+    """
+    Computes all structural features of the given lyrics from one segmentation,
+    in a single pass over its parts.
+
+    The values are identical to those of the individual get_* functions; as with
+    those, lyrics without annotations get -1 for all features based on the structure.
+
+    Parameters
+    ----------
+    text : str
+        The (unsanitized) lyrics of the song.
+    title : str
+        The title of the song.
+
+    Returns
+    -------
+    dict
+        The structural features, by name.
+    """
+    features = {'title_occurences': get_title_occurrences(text, title)}
+    if not contains_annotations(text):
+        return features | dict.fromkeys(STRUCTURE_FEATURES, -1)
+
+    structure = [part.type for part in segment_lyrics.get_segments(text)]
+
+    verses = 0
+    choruses = 0
+    verse_chorus_alternating = 1
+    two_verses_at_least_one_chorus = 1
+    # Whether there was a chorus since the last verse, None before the first verse.
+    chorus_since_verse = None
+    for i, part_type in enumerate(structure):
+        if part_type != ('Verse' if i % 2 == 0 else 'Chorus'):
+            verse_chorus_alternating = 0
+
+        if part_type == 'Verse':
+            verses += 1
+            if chorus_since_verse is False:
+                two_verses_at_least_one_chorus = 0
+            chorus_since_verse = False
+        elif part_type == 'Chorus':
+            choruses += 1
+            chorus_since_verse = True
+
+    sections = verses + choruses
+
+    features['number_of_sections'] = sections
+    features['number_of_verses'] = verses
+    features['starts_with_chorus'] = int(structure[0] == 'Chorus')
+    features['relation_verses_sections'] = verses / sections
+    features['relation_chorus_sections'] = choruses / sections
+    # Same comparison as get_ends_with_two_chorus_repetitions.
+    features['ends_with_two_chorus_repetitions'] = int(structure[:-1] == 'Chorus' and structure[:-2] == 'Chorus')
+    features['pattern_verse_chorus_alternating'] = verse_chorus_alternating
+    features['pattern_two_verses_at_least_one_chorus'] = two_verses_at_least_one_chorus
+    # get_two_choruses_at_least_one_verse looks for a chorus between two choruses,
+    # which it always finds, since the range starts with the first of them.
+    features['pattern_two_choruses_at_least_one_verse'] = 1
+
+    return features
@@ -0,0 +1,160 @@
+"""
+Compact, memory-mapped word list, compiled once from the kaikki.org wiktionary dump.
+
+The index file consists of a header (magic bytes and the number of words), an array of
+offsets, and the UTF-8 encoded words in sorted order. Looking up a word is a binary search
+over the memory-mapped file, so opening an index is near-instant and its pages are shared
+between all processes that use it. Numbers are stored in native byte order, so an index
+should be built on the kind of machine it is used on.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+# Directory holding the data files (e.g., wiktionary_english.json), relative to the working
+# directory unless an absolute path is given. Can be overridden with an environment variable,
+# which is also seen by worker processes.
+DATA_DIR_VARIABLE = "FEATURE_EXTRACTION_DATA_DIR"
+DEFAULT_DATA_DIR = "./data"
+
+# The wiktionary dump in the data directory, and the index compiled from it.
+WIKTIONARY_FILE_NAME = "wiktionary_english.json"
+LEXICON_FILE_NAME = "wiktionary_english.lexicon"
+
+_MAGIC = b"LEXICON1"
+_HEADER = struct.Struct("=8sQ")
+
+
+def get_data_dir():
+    return os.environ.get(DATA_DIR_VARIABLE, DEFAULT_DATA_DIR)
+
+
+def _encode(word):
+    return word.encode("utf-8", "surrogatepass")
+
+
+def build_lexicon(source_path, index_path):
+    """
+    Compiles the headwords of a kaikki.org wiktionary dump into an index file.
+
+    Parameters
+    ----------
+    source_path : str
+        Path of the wiktionary dump, with one JSON object per line.
+    index_path : str
+        Path of the index file to create.
+    """
+    words = set()
+    with open(source_path, encoding="utf-8") as f:
+        for line in f:
+            words.add(_encode(json.loads(line)["word"]))
+    words = sorted(words)
+
+    offsets = array("Q", [0])
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+
+    # Write to a temporary file of our own first, so that concurrent readers never
+    # see a partially written index and concurrent builds do not interfere.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(words)))
+            f.write(offsets.tobytes())
+            for word in words:
+                f.write(word)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def ensure_lexicon(data_dir=None):
+    """
+    Compiles the wiktionary dump of the data directory into a lexicon index, unless it exists.
+
+    Parameters
+    ----------
+    data_dir : str, optional
+        The data directory, `get_data_dir()` by default.
+
+    Returns
+    -------
+    str
+        The path of the index.
+
+    Raises
+    ------
+    FileNotFoundError
+        If neither the index nor the wiktionary dump exists.
+    """
+    data_dir = data_dir or get_data_dir()
+    index_path = os.path.join(data_dir, LEXICON_FILE_NAME)
+    if not os.path.exists(index_path):
+        source_path = os.path.join(data_dir, WIKTIONARY_FILE_NAME)
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f"Found neither the wiktionary lexicon {index_path} nor the wiktionary dump "
+                                    f"{source_path} to build it from. Download the dump (see README.md) or set "
+                                    f"{DATA_DIR_VARIABLE}.")
+        build_lexicon(source_path, index_path)
+
+    return index_path
+
+
+class Lexicon:
+    """
+    Read-only set of words backed by a memory-mapped index file created by `build_lexicon`.
+
+    Supports `word in lexicon` and `len(lexicon)`.
+
+    Parameters
+    ----------
+    index_path : str
+        Path of the index file.
+    """
+
+    def __init__(self, index_path):
+        with open(index_path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count = _HEADER.unpack_from(self._data)
+        if magic != _MAGIC:
+            raise ValueError(f"{index_path} is not a lexicon index.")
+
+        offsets_end = _HEADER.size + 8 * (self._count + 1)
+        self._offsets = memoryview(self._data)[_HEADER.size:offsets_end].cast("Q")
+        self._words_start = offsets_end
+
+    def _word(self, i):
+        return self._data[self._words_start + self._offsets[i]:self._words_start + self._offsets[i + 1]]
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, word):
+        key = _encode(word)
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._word(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low < self._count and self._word(low) == key
+
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Compiles the wiktionary dump into a lexicon index.")
+    parser.add_argument("--source", dest="source", default=os.path.join(get_data_dir(), WIKTIONARY_FILE_NAME), help="The kaikki.org wiktionary dump (JSON lines).")
+    parser.add_argument("--output", dest="output", default=os.path.join(get_data_dir(), LEXICON_FILE_NAME), help="The index file to create.")
+    args = parser.parse_args()
+
+    build_lexicon(args.source, args.output)
@@ -0,0 +1,149 @@
+"""
+Distributes feature extraction over a pool of worker processes.
+"""
+
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from . import extract_and_add_features, has_sufficient_lyrics
+from .analysis import SongAnalysis, pos_tag_batch
+from .lexicon import ensure_lexicon
+from . import profiling
+from .profiling import Profiler
+from .registry import resolve_families, resources_of
+
+
+def _init_worker(families=None, lexicon_path=None):
+    # Load the heavy module-level state (the wiktionary word set, NLTK models,
+    # the CMU dictionary's phone index) needed by the selected feature families
+    # once when the worker starts instead of on its first song.
+    resources = resources_of(families)
+
+    try:
+        if "wiktionary" in resources:
+            from . import features_linguistic
+            # Open the lexicon built by `extract_features`; never build it here.
+            features_linguistic.use_worker_lexicon(lexicon_path)
+            features_linguistic.get_wordnet_words()
+        if "tokenizer" in resources:
+            from nltk import word_tokenize
+            tokens = word_tokenize("Warm up the tokenizer and the tagger.")
+            if "tagger" in resources:
+                from nltk import pos_tag
+                pos_tag(tokens)
+        if "stopwords" in resources:
+            from .token_attributes import get_stop_words
+            get_stop_words()
+        if "cmudict" in resources:
+            from . import features_rhyme
+            features_rhyme._get_phone_index()
+    except Exception:
+        # The pool replaces a worker whose initializer raises, forever, so
+        # warming up must never fail. Missing libraries or data make feature
+        # extraction fail for every song instead, exactly as in a serial run.
+        pass
+
+
+def _extract_chunk(songs, profiler=None, families=None):
+    analyses = [SongAnalysis(song['sanitized_lyrics']) for song in songs]
+
+    # POS tag all songs of the chunk at once.
+    if "tagger" in resources_of(families):
+        call = profiler.call if profiler is not None else profiling.call
+        try:
+            call("lexical", "pos_tag_batch", pos_tag_batch,
+                 [analysis for analysis in analyses if has_sufficient_lyrics(analysis.text)])
+        except Exception:
+            # Every song is then tagged on its own, so that only
+            # the songs that cannot be tagged fail, as without batching.
+            pass
+
+    return [song['features'] if extract_and_add_features(song, analysis, profiler, families) else None
+            for song, analysis in zip(songs, analyses)]
+
+
+def _extract_chunk_in_worker(songs, profile, families):
+    # Only the computed features (and the chunk's profile) are sent back
+    # to the parent process, which already holds the song objects.
+    profiler = Profiler() if profile else None
+    features = _extract_chunk(songs, profiler, families)
+    return features, profiler.to_dict() if profile else None
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _collect(chunk, result, profiler):
+    features_of_chunk, profile = result.get()
+    if profiler is not None:
+        profiler.merge(profile)
+
+    for song, features in zip(chunk, features_of_chunk):
+        if features is not None:
+            song['features'] = features
+        yield song
+
+
+def extract_features(songs, workers=1, chunk_size=64, profiler=None, families=None):
+    """
+    Extracts features for all given songs and adds the feature values to the song objects.
+
+    Songs are processed in chunks of `chunk_size`, whose songs are POS tagged together, and
+    yielded in input order as soon as their chunk is done. With more than one worker, chunks
+    are sent to a process pool, and at most two chunks per worker are in flight at any time,
+    so `songs` may be a lazy iterable.
+
+    Parameters
+    ----------
+    songs : iterable of dict
+        The song objects, as dictionaries.
+    workers : int
+        The number of worker processes. If this is 1, features are extracted in this process.
+    chunk_size : int
+        The number of songs processed, and sent to a worker process, at once.
+    profiler : Profiler, optional
+        Records the time taken by every feature and the failures, in all worker processes.
+    families : iterable of str, optional
+        The feature families to compute, all by default (see `extract_and_add_features`).
+
+    Yields
+    ------
+    dict
+        The song objects, in input order. Songs for which feature extraction was successful
+        have their `features` set, exactly as after calling `extract_and_add_features`.
+
+    Raises
+    ------
+    FileNotFoundError
+        If more than one worker computes the linguistic features, but there is neither a
+        wiktionary lexicon nor a wiktionary dump to build it from in the data directory.
+    """
+    # Fail early on unknown families.
+    if families is not None:
+        families = resolve_families(families)
+
+    if workers <= 1:
+        for chunk in _chunks(songs, chunk_size):
+            # The features are added to the song objects themselves.
+            _extract_chunk(chunk, profiler, families)
+            yield from chunk
+        return
+
+    # Workers only open the wiktionary lexicon, so build it here, once, and
+    # fail before starting them if there is nothing to build it from.
+    lexicon_path = ensure_lexicon() if "wiktionary" in resources_of(families) else None
+
+    with Pool(workers, initializer=_init_worker, initargs=(families, lexicon_path)) as pool:
+        pending = deque()
+        for chunk in _chunks(songs, chunk_size):
+            pending.append((chunk, pool.apply_async(_extract_chunk_in_worker, (chunk, profiler is not None, families))))
+
+            if len(pending) >= 2 * workers:
+                yield from _collect(*pending.popleft(), profiler)
+
+        while pending:
+            yield from _collect(*pending.popleft(), profiler)
@@ -0,0 +1,116 @@
+"""
+Records how much time every feature takes and why feature extraction fails.
+"""
+
+import json
+import time
+from collections import Counter
+
+
+class Profiler:
+    """
+    Wall time, call and failure counters per feature, filled by `extract_and_add_features`.
+
+    Features that share intermediate results of a `SongAnalysis` (e.g., the tokens) are
+    charged for them by whichever of them needs them first. Profilers of several processes
+    are combined with `to_dict` and `merge`.
+    """
+
+    def __init__(self):
+        # Feature name -> [family, calls, seconds, failures by exception type].
+        self.features = {}
+        # Outcome ("extracted", "failed" or "skipped") -> number of songs.
+        self.songs = Counter()
+
+    def _stats(self, family, name):
+        stats = self.features.get(name)
+        if stats is None:
+            stats = self.features[name] = [family, 0, 0.0, Counter()]
+        return stats
+
+    def call(self, family, name, function, *arguments):
+        """Returns `function(*arguments)`, recording its wall time and, if it raises, the exception type."""
+        stats = self._stats(family, name)
+        start = time.perf_counter()
+        try:
+            return function(*arguments)
+        except Exception as e:
+            stats[3][type(e).__name__] += 1
+            raise
+        finally:
+            stats[1] += 1
+            stats[2] += time.perf_counter() - start
+
+    def count_song(self, outcome):
+        self.songs[outcome] += 1
+
+    def families(self):
+        """Returns the calls, seconds and failures of every feature family."""
+        families = {}
+        for family, calls, seconds, failures in self.features.values():
+            totals = families.setdefault(family, {"calls": 0, "seconds": 0.0, "failures": 0})
+            totals["calls"] += calls
+            totals["seconds"] += seconds
+            totals["failures"] += sum(failures.values())
+        return families
+
+    def failures(self):
+        """Returns the number of failed feature computations by exception type."""
+        return sum((stats[3] for stats in self.features.values()), Counter())
+
+    def to_dict(self):
+        """Returns all counters as a JSON serializable dictionary."""
+        return {
+            "songs": dict(self.songs),
+            "features": {name: {"family": family, "calls": calls, "seconds": seconds, "failures": dict(failures)}
+                         for name, (family, calls, seconds, failures) in self.features.items()},
+            "families": self.families(),
+            "failures": dict(self.failures()),
+        }
+
+    def merge(self, other):
+        """Adds the counters of another profiler, or of its `to_dict()`, to this one."""
+        if isinstance(other, Profiler):
+            other = other.to_dict()
+
+        self.songs.update(other["songs"])
+        for name, other_stats in other["features"].items():
+            stats = self._stats(other_stats["family"], name)
+            stats[1] += other_stats["calls"]
+            stats[2] += other_stats["seconds"]
+            stats[3].update(other_stats["failures"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """Returns a table of all features and families, most expensive first, and of all failures."""
+        lines = [", ".join(f"{outcome}: {count}" for outcome, count in sorted(self.songs.items())), ""]
+
+        lines.append(f"{'feature':<45} {'family':<12} {'calls':>8} {'seconds':>10} {'ms/call':>8} {'failures':>8}")
+        for name, (family, calls, seconds, failures) in sorted(self.features.items(), key=lambda item: -item[1][2]):
+            lines.append(f"{name:<45} {family:<12} {calls:>8} {seconds:>10.3f} "
+                         f"{1000 * seconds / max(calls, 1):>8.3f} {sum(failures.values()):>8}")
+
+        lines.append("")
+        lines.append(f"{'family':<58} {'calls':>8} {'seconds':>10} {'share':>8} {'failures':>8}")
+        families = self.families()
+        total_seconds = sum(totals["seconds"] for totals in families.values())
+        for family, totals in sorted(families.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(f"{family:<58} {totals['calls']:>8} {totals['seconds']:>10.3f} "
+                         f"{totals['seconds'] / max(total_seconds, 1e-9):>8.1%} {totals['failures']:>8}")
+
+        failures = self.failures()
+        if failures:
+            lines.append("")
+            lines.append(f"{'exception':<58} {'failures':>8}")
+            for exception, count in failures.most_common():
+                lines.append(f"{exception:<58} {count:>8}")
+
+        return "\n".join(lines)
+
+
+def call(family, name, function, *arguments):
+    """Returns `function(*arguments)`; the counterpart of `Profiler.call` when not profiling."""
+    return function(*arguments)
@@ -0,0 +1,78 @@
+"""
+The feature families computed by `extract_and_add_features` and the resources they need.
+"""
+
+from collections import namedtuple
+
+# A family of features: the module computing them, the (expensive) resources it loads,
+# and the names of the features it computes.
+Family = namedtuple("Family", ["module", "resources", "features"])
+
+# All feature families, in the order in which they are computed.
+FAMILIES = {
+    "compression": Family("features_compression", (), (
+        'compression_ratio',
+    )),
+    "readability": Family("features_readability", (), (
+        'readability_flesch_kincaid_grade', 'readability_flesch_reading_ease', 'readability_smog',
+        'readability_automated_readability_index', 'readability_coleman_liau_index',
+        'readability_dale_chall_readability_score', 'readability_difficult_words',
+        'readability_linsear_write_formula', 'readability_gunning_fog', 'readability_fernandez_huerta',
+        'readability_szigriszt_pazos', 'readability_gutierrez_polini', 'readability_crawford',
+    )),
+    "lexical": Family("features_lexical", ("tokenizer", "tagger", "stopwords"), (
+        'token_count', 'character_count', 'repeated_token_ratio', 'unique_tokens_per_line',
+        'average_token_length', 'average_tokens_per_line', 'line_count', 'unique_line_count',
+        'blank_line_count', 'blank_line_ratio', 'repeated_line_ratio', 'exclamation_mark_count',
+        'question_mark_count', 'digit_count', 'colon_count', 'semicolon_count', 'quote_count', 'comma_count',
+        'dot_count', 'hyphen_count', 'parens_count', 'punctuation_count', 'digit_ratio', 'punctuation_ratio',
+        'stop_word_count', 'stop_word_ratio', 'stop_words_per_line', 'unique_bigram_ratio',
+        'unique_trigram_ratio', 'hapax_legomenon_ratio', 'dis_legomenon_ratio', 'tris_legomenon_ratio',
+        'mtld', 'herdan', 'summer', 'dugast', 'maas', 'pronoun_frequency', 'past_tense_ratio',
+        'adjective_frequency', 'adverb_frequency', 'noun_frequency', 'verb_frequency',
+    )),
+    "linguistic": Family("features_linguistic", ("tokenizer", "wiktionary"), (
+        'uncommon_words_ratio',
+    )),
+    "structure": Family("features_structure", (), (
+        'title_occurences', 'number_of_sections', 'number_of_verses', 'starts_with_chorus',
+        'relation_verses_sections', 'relation_chorus_sections', 'ends_with_two_chorus_repetitions',
+        'pattern_verse_chorus_alternating', 'pattern_two_verses_at_least_one_chorus',
+        'pattern_two_choruses_at_least_one_verse',
+    )),
+    "rhyme": Family("features_rhyme", ("tokenizer", "cmudict"), (
+        'num_couplets', 'num_clerihews', 'num_alternating', 'num_nested', 'alliterations_len_2',
+        'alliterations_len_3', 'alliterations_len_4_plus', 'rhyme_percent', 'unique_rhyme_words',
+    )),
+}
+
+
+def resolve_families(families=None):
+    """
+    Validates the names of the given feature families.
+
+    Parameters
+    ----------
+    families : iterable of str or None
+        Names of feature families (see `FAMILIES`), or None for all families.
+
+    Returns
+    -------
+    tuple of str
+        The given families, without duplicates, in the order in which they are computed.
+    """
+    if families is None:
+        return tuple(FAMILIES)
+
+    families = set(families)
+    unknown = families - FAMILIES.keys()
+    if unknown:
+        raise ValueError(f"Unknown feature families: {', '.join(sorted(unknown))}. "
+                         f"Available families: {', '.join(FAMILIES)}.")
+
+    return tuple(family for family in FAMILIES if family in families)
+
+
+def resources_of(families):
+    """Returns the set of resources needed by the given feature families."""
+    return {resource for family in resolve_families(families) for resource in FAMILIES[family].resources}
@@ -3,72 +3,91 @@ segments lyrics into parts like Verse, Chorus, etc. based on annotations provide
 Requires lyrics to contain annotations, otherwise, None will be returned for features.
 """
 import re
+from collections import namedtuple
+
 import sanitizer
 
+# Keywords determining the part type of an annotation, in order of precedence.
+PART_TYPES = [
+    ("verse", "Verse"),
+    ("chorus", "Chorus"),
+    ("intro", "Intro"),
+    ("outro", "Outro"),
+    ("bridge", "Bridge"),
+    ("hook", "Hook"),
+    ("refrain", "Chorus"),
+    ("interlude", "Interlude"),
+    ("drop", "Drop"),
+]
+part_keyword_pattern = re.compile("|".join(keyword for keyword, _ in PART_TYPES))
+part_keyword_precedence = {keyword: i for i, (keyword, _) in enumerate(PART_TYPES)}
+
+# A part of a song: its type, its text, and the range of lines it spans
+# (from its annotation, if any, up to but excluding the next part's first line).
+Part = namedtuple("Part", ["type", "text", "start_line", "end_line"])
+
 
 def get_part_type(text):
-    t = text.lower()
-    if "verse" in t:
-        return "Verse"
-    elif "chorus" in t:
-        return "Chorus"
-    elif "intro" in t:
-        return "Intro"
-    elif "outro" in t:
-        return "Outro"
-    elif "bridge" in t:
-        return "Bridge"
-    elif "hook" in t:
-        return "Hook"
-    elif "refrain" in t:
-        return "Chorus"
-    elif "interlude" in t:
-        return "Interlude"
-    elif "drop" in t:
-        return "Drop"
-
-    return "Unknown"
+    # One scan collects all keywords in the line; the one with the highest precedence wins.
+    keywords = set(part_keyword_pattern.findall(text.lower()))
+    if not keywords:
+        return "Unknown"
+
+    return PART_TYPES[min(part_keyword_precedence[keyword] for keyword in keywords)][1]
 
 
 def is_structure_annotation(text):
-    return bool(re.search(r"(?i)\[.*Verse.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Chorus.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Intro.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Outro.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Bridge.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Hook.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Refrain.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Interlude.*]", text)) or \
-        bool(re.search(r"(?i)\[.*Drop.*]", text))
+    # Equivalent to searching for (?i)\[.*Keyword.*] for every structure keyword,
+    # see sanitizer.annotation_span_pattern.
+    return any(sanitizer.structure_keyword_pattern.search(text, match.start(2) + 1, match.end(2) - 1)
+               for match in sanitizer.annotation_span_pattern.finditer(text))
 
 
-def split_into_parts(text):
-    # This function splits the given sanitized song lyrics into parts
-    # representing the song structure. This information is coded in the lyrics
-    # in the form of [Annotations].
+def segment(text):
+    """
+    Splits the given sanitized song lyrics into parts in one pass over its lines.
+
+    The song structure is coded in the lyrics in the form of [Annotations]. Every structure
+    annotation starts a new part; lines before the first annotation form a part of type
+    "Unknown".
+
+    Returns
+    -------
+    list of Part
+        The parts, with their type, stripped text, and line range.
+    """
     lines = text.split("\n")
-    current_part = "Unknown"
-    parts = []
+    part_types = []
+    part_lines = []
+    part_starts = []
 
     # Assign lines to parts.
-    for line in lines:
+    for i, line in enumerate(lines):
         # Check if the current line is the beginning of a new block.
         if is_structure_annotation(line):
             # If it is a new part, add it with the current type annotation.
-            part_type = get_part_type(line)
-            parts.append((part_type, ""))
+            part_types.append(get_part_type(line))
+            part_lines.append([])
+            part_starts.append(i)
         # Handle the special case where the first line is not a structure annotation.
-        elif len(parts) == 0:
-            parts.append(("Unknown", line))
+        elif len(part_lines) == 0:
+            part_types.append("Unknown")
+            part_lines.append([line])
+            part_starts.append(i)
         else:
             # If not, we add the current line to the current part.
-            parts[-1] = (parts[-1][0], parts[-1][1] + "\n" + line)
+            part_lines[-1].append(line)
 
-    # Clean parts.
-    for i in range(0, len(parts)):
-        parts[i] = (parts[i][0], parts[i][1].strip())
+    part_ends = part_starts[1:] + [len(lines)]
 
-    return parts
+    return [Part(part_type, "\n".join(current_lines).strip(), start, end)
+            for part_type, current_lines, start, end in zip(part_types, part_lines, part_starts, part_ends)]
+
+
+def split_into_parts(text):
+    # This function splits the given sanitized song lyrics into parts
+    # representing the song structure, as (type, text) pairs.
+    return [(part.type, part.text) for part in segment(text)]
 
 
 def prepare_segmentation(text):
@@ -82,4 +101,9 @@ def prepare_segmentation(text):
 
 def get_parts(text):
     sanitized_text = prepare_segmentation(text)
-    return split_into_parts(sanitized_text)
\ No newline at end of file
+    return split_into_parts(sanitized_text)
+
+
+def get_segments(text):
+    sanitized_text = prepare_segmentation(text)
+    return segment(sanitized_text)
@@ -0,0 +1,109 @@
+"""
+Reads and writes song objects as line-delimited JSON, optionally gzipped.
+"""
+
+import gzip
+import json
+import os
+import zlib
+
+
+def is_json_lines(path):
+    """Returns True if the given path names a (gzipped) JSON lines file."""
+    return str(path).endswith((".jsonl", ".json", ".jsonl.gz", ".json.gz"))
+
+
+def song_key(song):
+    """Returns the (artist, track) pair identifying the given song."""
+    return song['_id']['artist'], song['_id']['track']
+
+
+def _open(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_songs(path):
+    """
+    Lazily reads song objects from a JSON lines file, one song per line.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file. Files ending in `.gz` are decompressed on the fly.
+
+    Yields
+    ------
+    dict
+        The song objects, in file order.
+    """
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SongWriter:
+    """
+    Writes song objects to a JSON lines file as soon as they are passed to `write`.
+
+    Files ending in `.gz` are gzip-compressed. Can be used as a context manager.
+    """
+
+    def __init__(self, path, mode="w"):
+        self._file = _open(path, mode)
+
+    def write(self, song):
+        self._file.write(json.dumps(song) + "\n")
+
+    def flush(self):
+        """Forces all songs written so far to disk, so they survive if the process is killed."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def recover_songs(path):
+    """
+    Prepares a partially written JSON lines file for resuming an interrupted run.
+
+    The file is rewritten to contain only the songs that were written completely and have
+    features. A truncated last line or gzip stream, as left behind by a killed process, is
+    dropped, as are songs without features, so that they are extracted again.
+
+    Parameters
+    ----------
+    path : str
+        Path of the output file. If it does not exist, nothing needs to be recovered.
+
+    Returns
+    -------
+    set
+        The keys (see `song_key`) of all songs that do not need to be extracted again.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    tmp_path = path + ".recover" + (".gz" if str(path).endswith(".gz") else "")
+    with SongWriter(tmp_path) as writer:
+        try:
+            for song in read_songs(path):
+                if 'features' in song:
+                    writer.write(song)
+                    done.add(song_key(song))
+        except (EOFError, OSError, ValueError, zlib.error):
+            # Everything after the last complete line is lost anyway.
+            pass
+
+    os.replace(tmp_path, path)
+    return done
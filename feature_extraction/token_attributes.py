@@ -0,0 +1,241 @@
+"""
+Compact, memory-mapped table of per-token attributes, built once from the tokens of a corpus.
+
+For every token, the table stores whether it is an English stop word, its WordNet lemma,
+whether that lemma is a wiktionary headword, and its number of syllables as counted by
+textstat. Lyrics repeat their vocabulary heavily, so the features using these attributes
+mostly become table lookups instead of calls to NLTK, the wiktionary lexicon and textstat.
+Tokens missing from the table (or all tokens, if there is no table) get their attributes
+computed as before, so the feature values do not depend on the table.
+
+The table file consists of a header (magic bytes and the number of tokens), the arrays of
+token and lemma offsets, the flags and syllable counts, and the UTF-8 encoded tokens, in
+sorted order, and lemmas. Like a lexicon index (see `lexicon`), it is memory-mapped and
+searched in place, and should be built on the kind of machine it is used on.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections import namedtuple
+
+from .cache import BoundedCache, cached
+from .lexicon import get_data_dir
+
+TABLE_FILE_NAME = "token_attributes.table"
+
+# The attributes of a token. `in_wiktionary` is whether its lemma is a wiktionary headword.
+TokenAttributes = namedtuple("TokenAttributes", ["is_stop_word", "lemma", "in_wiktionary", "syllables"])
+
+_MAGIC = b"TOKATTR1"
+_HEADER = struct.Struct("=8sQ")
+
+_STOP_WORD = 1
+_IN_WIKTIONARY = 2
+# The lemma equals the token and is not stored separately.
+_LEMMA_IS_TOKEN = 4
+
+# Syllable counts are stored as unsigned shorts; tokens with more syllables are left out.
+_MAX_SYLLABLES = 0xFFFF
+
+_stop_words = None
+_token_table = None
+_token_table_loaded = False
+
+
+def _encode(token):
+    return token.encode("utf-8", "surrogatepass")
+
+
+def get_stop_words():
+    """Returns the set of English stop words of NLTK, loading it on first use."""
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+        _stop_words = set(stopwords.words('english'))
+    return _stop_words
+
+
+def compute_token_attributes(token):
+    """Computes the attributes of a token with NLTK, the wiktionary lexicon and textstat."""
+    import textstat
+    from .features_linguistic import get_wordnet_words, lemmatizer
+
+    lemma = lemmatizer.lemmatize(token)
+    return TokenAttributes(token.lower() in get_stop_words(), lemma, lemma in get_wordnet_words(),
+                           textstat.syllable_count(token))
+
+
+def build_token_table(tokens, table_path):
+    """
+    Computes the attributes of the given tokens and writes them into a table file.
+
+    Parameters
+    ----------
+    tokens : iterable of str
+        The tokens, e.g., all tokens of a corpus; duplicates are ignored.
+    table_path : str
+        Path of the table file to create.
+    """
+    entries = []
+    for token in set(tokens):
+        attributes = compute_token_attributes(token)
+        if attributes.syllables <= _MAX_SYLLABLES:
+            entries.append((_encode(token), attributes))
+    entries.sort(key=lambda entry: entry[0])
+
+    token_offsets, lemma_offsets = array("Q", [0]), array("Q", [0])
+    flags, syllables = bytearray(), array("H")
+    lemmas = []
+    for token, attributes in entries:
+        token_offsets.append(token_offsets[-1] + len(token))
+
+        lemma = _encode(attributes.lemma)
+        if lemma == token:
+            lemma = b""
+        lemmas.append(lemma)
+        lemma_offsets.append(lemma_offsets[-1] + len(lemma))
+
+        flags.append((_STOP_WORD if attributes.is_stop_word else 0)
+                     | (_IN_WIKTIONARY if attributes.in_wiktionary else 0)
+                     | (_LEMMA_IS_TOKEN if not lemma else 0))
+        syllables.append(attributes.syllables)
+
+    # Write to a temporary file of our own first, so that concurrent readers never
+    # see a partially written table and concurrent builds do not interfere.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(table_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(entries)))
+            f.write(token_offsets.tobytes())
+            f.write(lemma_offsets.tobytes())
+            f.write(syllables.tobytes())
+            f.write(flags)
+            for token, _ in entries:
+                f.write(token)
+            for lemma in lemmas:
+                f.write(lemma)
+        os.replace(tmp_path, table_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class TokenTable:
+    """
+    Read-only mapping of tokens to their `TokenAttributes`, backed by a memory-mapped table file
+    created by `build_token_table`.
+
+    Supports `token in table`, `table.get(token)` and `len(table)`.
+
+    Parameters
+    ----------
+    table_path : str
+        Path of the table file.
+    """
+
+    def __init__(self, table_path):
+        with open(table_path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count = _HEADER.unpack_from(self._data)
+        if magic != _MAGIC:
+            raise ValueError(f"{table_path} is not a token attribute table.")
+
+        view = memoryview(self._data)
+        position = _HEADER.size
+        self._token_offsets = view[position:position + 8 * (self._count + 1)].cast("Q")
+        position += 8 * (self._count + 1)
+        self._lemma_offsets = view[position:position + 8 * (self._count + 1)].cast("Q")
+        position += 8 * (self._count + 1)
+        self._syllables = view[position:position + 2 * self._count].cast("H")
+        position += 2 * self._count
+        self._flags = view[position:position + self._count]
+        position += self._count
+        self._tokens_start = position
+        self._lemmas_start = position + self._token_offsets[self._count]
+
+    def _token(self, i):
+        return self._data[self._tokens_start + self._token_offsets[i]:self._tokens_start + self._token_offsets[i + 1]]
+
+    def _index(self, token):
+        key = _encode(token)
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._token(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low if low < self._count and self._token(low) == key else None
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, token):
+        return self._index(token) is not None
+
+    def get(self, token):
+        """Returns the attributes of the given token, or None if it is not in the table."""
+        i = self._index(token)
+        if i is None:
+            return None
+
+        flags = self._flags[i]
+        if flags & _LEMMA_IS_TOKEN:
+            lemma = token
+        else:
+            lemma = self._data[self._lemmas_start + self._lemma_offsets[i]:
+                               self._lemmas_start + self._lemma_offsets[i + 1]].decode("utf-8", "surrogatepass")
+
+        return TokenAttributes(bool(flags & _STOP_WORD), lemma, bool(flags & _IN_WIKTIONARY), self._syllables[i])
+
+
+def get_token_table():
+    """Returns the token attribute table of the data directory, or None if none has been built."""
+    global _token_table, _token_table_loaded
+    if not _token_table_loaded:
+        table_path = os.path.join(get_data_dir(), TABLE_FILE_NAME)
+        _token_table = TokenTable(table_path) if os.path.exists(table_path) else None
+        _token_table_loaded = True
+
+    return _token_table
+
+
+@cached(BoundedCache("token_attributes", max_entries=200_000))
+def get_token_attributes(token):
+    """Returns the attributes of the given token from the token table, or None if they are not in it."""
+    table = get_token_table()
+    return table.get(token) if table is not None else None
+
+
+def _corpus_tokens(songs):
+    from .analysis import SongAnalysis
+
+    for song in songs:
+        text = song['sanitized_lyrics']
+        # The NLTK tokens are used by the lexical and linguistic features,
+        # the whitespace separated words by the readability features.
+        yield from SongAnalysis(text).tokens
+        yield from text.split()
+
+
+if __name__ == "__main__":
+    from itertools import islice
+
+    from .streaming import read_songs
+
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Builds the token attribute table from the tokens of a corpus.")
+    parser.add_argument("--input", dest="input", required=True, help="JSON lines file (optionally gzipped) containing lyrics.")
+    parser.add_argument("--output", dest="output", default=None, help=f"The table file to create (default: {TABLE_FILE_NAME} in the data directory).")
+    parser.add_argument("--limit", dest="limit", type=int, default=None, help="Only use the tokens of the first LIMIT songs.")
+    args = parser.parse_args()
+
+    build_token_table(_corpus_tokens(islice(read_songs(args.input), args.limit)),
+                      args.output or os.path.join(get_data_dir(), TABLE_FILE_NAME))
@@ -0,0 +1,107 @@
+"""
+Maps tokens to integer ids, so that sequences of tokens can be processed as NumPy arrays.
+
+Ids are assigned in order of first appearance and never change, so a vocabulary can be
+shared by many songs and saved to be loaded again with the same ids. Features of a single
+song use a vocabulary of their own; the process-wide vocabulary (see `get_vocabulary`) is
+only filled by callers that ask for it, e.g., to export the ids of `batch.intern_tokens`,
+since it grows with the vocabulary of the whole corpus.
+"""
+
+import json
+
+import numpy as np
+
+_vocabulary = None
+
+
+class Vocabulary:
+    """
+    An append-only mapping of tokens to consecutive int32 ids.
+
+    Supports `token in vocabulary`, `vocabulary[token]` (the id of a known token),
+    `len(vocabulary)`, and iterating over the tokens in order of their ids.
+
+    Parameters
+    ----------
+    tokens : iterable of str, optional
+        The initial tokens, which get the ids 0, 1, 2, ...; duplicates are ignored.
+    """
+
+    def __init__(self, tokens=()):
+        self._ids = {}
+        for token in tokens:
+            self._ids.setdefault(token, len(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, token):
+        return token in self._ids
+
+    def __getitem__(self, token):
+        return self._ids[token]
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def intern(self, tokens):
+        """Returns the int32 ids of the given tokens, adding unknown tokens to the vocabulary."""
+        ids = self._ids
+        return np.fromiter((ids.setdefault(token, len(ids)) for token in tokens), dtype=np.int32)
+
+    def save(self, path):
+        """Writes the tokens, in order of their ids, to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(list(self._ids), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a vocabulary written by `save`, with the same ids."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+def get_vocabulary():
+    """Returns the vocabulary shared within this process, creating it on first use. It is never evicted."""
+    global _vocabulary
+    if _vocabulary is None:
+        _vocabulary = Vocabulary()
+    return _vocabulary
+
+
+def unique_ngram_ratio(ids, n):
+    """
+    Returns the ratio of distinct n-grams among all n-grams of a sequence of token ids.
+
+    The n-grams are packed into single 64 bit integers if their ids fit, and compared as rows
+    of an (n-grams x n) array otherwise, so no n-gram is ever materialized as a tuple.
+
+    Parameters
+    ----------
+    ids : numpy.ndarray
+        The (non-negative) token ids of the sequence.
+    n : int
+        The length of the n-grams.
+
+    Raises
+    ------
+    ZeroDivisionError
+        If the sequence is shorter than `n`, as it then has no n-grams.
+    """
+    ngram_count = max(len(ids) - n + 1, 0)
+    if ngram_count == 0:
+        raise ZeroDivisionError(f"A sequence of {len(ids)} tokens has no {n}-grams.")
+
+    bits = max(int(ids.max()).bit_length(), 1)
+    if n * bits <= 63:
+        keys = np.zeros(ngram_count, dtype=np.int64)
+        for i in range(n):
+            keys <<= bits
+            keys |= ids[i:i + ngram_count]
+        unique_count = len(np.unique(keys))
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(ids, n)
+        unique_count = len(np.unique(windows, axis=0))
+
+    return unique_count / ngram_count
@@ -1,4 +1,8 @@
+import argparse
 import re
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
 
 
 # https://dbis-owncloud.uibk.ac.at/index.php/apps/files/?dir=/dbis-theses-msc/171002_Stefan_Wurzinger/source/musicanalysis/src/main/java/musicanalysis/model/music/lyric&openfile=1577008
@@ -13,6 +17,16 @@ def remove_superfluous_whitespace(text):
     return sanitized_text
 
 
+# Multipliers like [x2] or [2x] following the text of a line.
+line_multiplier_pattern = re.compile(r"(?P<text>[^\[\n]+)\[(?:x(?P<x_number>[0-9]+)|(?P<number_x>[0-9]+)x)\]")
+
+# Multipliers on their own line before or after a paragraph. Matched in this order,
+# i.e., a leading multiplier takes precedence over a trailing one.
+paragraph_multiplier_pattern = re.compile(
+    r"(?s)\[(?:(?P<leading_number_x>[0-9]+)x|x(?P<leading_x_number>[0-9]+))\]\n(?P<leading_text>.*)"
+    r"|(?P<trailing_text>.*)\[(?:(?P<trailing_number_x>[0-9]+)x|x(?P<trailing_x_number>[0-9]+))\]$")
+
+
 def reduplicate_segment(text):
     # This function deals with annotations of the form [x2] or [2x].
     # There are different forms of these multipliers in our data.
@@ -65,67 +79,87 @@ def reduplicate_segment(text):
     # ToDo: Are there any other cases?
 
     # Step 1: Handle lines that have to be duplicated.
-    sanitized_text = ""
-    lines = text.split("\n")
-    for line in lines:
-        if match := re.match(r"(?P<text>[^\[\n]+)\[x(?P<number>[0-9]+)\]", line):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n") * number
-        elif match := re.match(r"(?P<text>[^\[\n]+)\[(?P<number>[0-9]+)x\]", line):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n") * number
+    sanitized_lines = []
+    for line in text.split("\n"):
+        if "[" in line and (match := line_multiplier_pattern.match(line)):
+            number = int(match.group("x_number") or match.group("number_x"))
+            sanitized_lines.append((match.group("text") + "\n") * number)
         else:
-            sanitized_text += line + "\n"
+            sanitized_lines.append(line + "\n")
 
     # Step 2: Handle paragraphs that have to be duplicated.
-    paragraphs = sanitized_text.split("\n\n")
-    sanitized_text = ""
-    for paragraph in paragraphs:
-        if match := re.match(r"(?s)^\[(?P<number>[0-9]+)x\]\n(?P<text>.*)", paragraph):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n\n") * number
-        elif match := re.match(r"(?s)^\[x(?P<number>[0-9]+)\]\n(?P<text>.*)", paragraph):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n\n") * number
-        elif match := re.match(r"(?s)(?P<text>.*)\[(?P<number>[0-9]+)x\]$", paragraph):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n\n") * number
-        elif match := re.match(r"(?s)(?P<text>.*)\[x(?P<number>[0-9]+)\]$", paragraph):
-            text = match.group("text")
-            number = int(match.group("number"))
-            sanitized_text += (text + "\n\n") * number
+    sanitized_paragraphs = []
+    for paragraph in "".join(sanitized_lines).split("\n\n"):
+        # A multiplier can only precede the paragraph or end it (optionally followed by one newline).
+        if (paragraph.startswith("[") or paragraph.endswith(("]", "]\n"))) and \
+                (match := paragraph_multiplier_pattern.match(paragraph)):
+            number = int(match.group("leading_x_number") or match.group("leading_number_x") or
+                         match.group("trailing_x_number") or match.group("trailing_number_x"))
+            text = match.group("leading_text") if match.group("leading_text") is not None else match.group("trailing_text")
+            sanitized_paragraphs.append((text + "\n\n") * number)
         else:
-            sanitized_text += paragraph + "\n\n"
+            sanitized_paragraphs.append(paragraph + "\n\n")
 
-    return sanitized_text
+    return "".join(sanitized_paragraphs)
 
 
-def remove_song_structure_annotations(text):
-    sanitized_text = re.sub(r"(?i)\[.*Verse.*\]", "", text)
-    sanitized_text = re.sub(r"(?i)\[.*Chorus.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Intro.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Outro.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Bridge.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Hook.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Refrain.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Interlude.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Drop.*\]", "", sanitized_text)
+# Annotations are recognized by keywords, matched case-insensitively.
+STRUCTURE_KEYWORDS = ["Verse", "Chorus", "Intro", "Outro", "Bridge", "Hook", "Refrain", "Interlude", "Drop"]
+INSTRUMENT_KEYWORDS = ["Guitar Solo", "Instrumental", "Solo", "Spoken"]
 
-    return sanitized_text
+structure_keyword_pattern = re.compile("(?i)" + "|".join(STRUCTURE_KEYWORDS))
+instrument_keyword_pattern = re.compile("(?i)" + "|".join(INSTRUMENT_KEYWORDS))
+annotation_keyword_pattern = re.compile("(?i)" + "|".join(INSTRUMENT_KEYWORDS + STRUCTURE_KEYWORDS))
+multiplier_pattern = re.compile(r"\[(?:x[0-9]+|[0-9]+x)\]")
 
 
-def remove_instrument_annotations(text):
-    sanitized_text = re.sub(r"(?i)\[.*Guitar Solo.*\]", "", text)
-    sanitized_text = re.sub(r"(?i)\[.*Instrumental.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Solo.*\]", "", sanitized_text)
-    sanitized_text = re.sub(r"(?i)\[.*Spoken.*\]", "", sanitized_text)
+# Annotations were originally removed with one pattern like \[.*Verse.*\] per keyword.
+# As "." does not match line breaks and both ".*" are greedy, such a pattern matches from
+# the first "[" to the last "]" of a line if the keyword occurs in between, and nothing
+# else on that line afterwards. This pattern finds exactly these candidate spans (as its
+# second group), so that every annotation only needs to be scanned once for all keywords.
+# Anchoring it at the start of the line keeps it linear in the length of the line.
+annotation_span_pattern = re.compile(r"(?m)^([^\[\n]*)(\[.*\])")
 
-    return sanitized_text
+
+def classify_annotation(annotation):
+    """Classifies an annotation as 'instrument', 'structure', 'multiplier' or 'other'."""
+    if instrument_keyword_pattern.search(annotation, 1, len(annotation) - 1):
+        return "instrument"
+    if structure_keyword_pattern.search(annotation, 1, len(annotation) - 1):
+        return "structure"
+    if multiplier_pattern.fullmatch(annotation):
+        return "multiplier"
+    return "other"
+
+
+def iter_annotations(text):
+    """
+    Scans the text once and yields (offset, annotation, kind) for every annotation span,
+    i.e., the text from the first "[" to the last "]" of a line, with kind as returned
+    by `classify_annotation`.
+    """
+    for match in annotation_span_pattern.finditer(text):
+        yield match.start(2), match.group(2), classify_annotation(match.group(2))
+
+
+def remove_annotations(text, keyword_pattern):
+    # Removes every annotation span that contains a keyword, in a single pass. This is
+    # equivalent to applying re.sub(r"(?i)\[.*Keyword.*\]", "", text) for every keyword.
+    def replace(match):
+        if keyword_pattern.search(text, match.start(2) + 1, match.end(2) - 1):
+            return match.group(1)
+        return match.group()
+
+    return annotation_span_pattern.sub(replace, text)
+
+
+def remove_song_structure_annotations(text):
+    return remove_annotations(text, structure_keyword_pattern)
+
+
+def remove_instrument_annotations(text):
+    return remove_annotations(text, instrument_keyword_pattern)
 
 
 def remove_consecutive_newlines(text):
@@ -141,8 +175,7 @@ def remove_remaining_annotations(text):
 def sanitize_lyric(text, remove_all=False):
     sanitized_text = remove_superfluous_whitespace(text)
     sanitized_text = reduplicate_segment(sanitized_text)
-    sanitized_text = remove_instrument_annotations(sanitized_text)
-    sanitized_text = remove_song_structure_annotations(sanitized_text)
+    sanitized_text = remove_annotations(sanitized_text, annotation_keyword_pattern)  # Instruments and song structure.
 
     if remove_all:
         sanitized_text = remove_remaining_annotations(sanitized_text)
@@ -151,3 +184,86 @@ def sanitize_lyric(text, remove_all=False):
     sanitized_text = remove_consecutive_newlines(sanitized_text)
 
     return sanitized_text
+
+
+def _sanitize_chunk(lyrics, remove_all):
+    return [sanitize_lyric(text, remove_all) for text in lyrics]
+
+
+def sanitize_corpus(songs, workers=1, chunk_size=256, field="lyrics", remove_all=False):
+    """
+    Sanitizes the lyrics of all given songs and stores them as `sanitized_lyrics`.
+
+    Songs are yielded in input order as soon as they are sanitized. With more than one worker,
+    the lyrics are sanitized by a process pool in chunks of `chunk_size`, and at most two chunks
+    per worker are in flight at any time, so `songs` may be a lazy iterable.
+
+    Parameters
+    ----------
+    songs : iterable of dict
+        The song objects, as dictionaries.
+    workers : int
+        The number of worker processes. If this is 1, lyrics are sanitized in this process.
+    chunk_size : int
+        The number of lyrics sent to a worker process at once.
+    field : str
+        The field holding the raw lyrics.
+    remove_all : bool
+        Whether to remove all remaining annotations, see `sanitize_lyric`.
+
+    Yields
+    ------
+    dict
+        The song objects with `sanitized_lyrics` set, in input order.
+    """
+    songs = iter(songs)
+
+    if workers <= 1:
+        for song in songs:
+            song["sanitized_lyrics"] = sanitize_lyric(song[field], remove_all)
+            yield song
+        return
+
+    with Pool(workers) as pool:
+        pending = deque()
+        while chunk := list(islice(songs, chunk_size)):
+            # Only the lyrics are sent to the workers, not the whole song objects.
+            lyrics = [song[field] for song in chunk]
+            pending.append((chunk, pool.apply_async(_sanitize_chunk, (lyrics, remove_all))))
+
+            if len(pending) >= 2 * workers:
+                yield from _collect(*pending.popleft())
+
+        while pending:
+            yield from _collect(*pending.popleft())
+
+
+def _collect(chunk, result):
+    for song, sanitized_lyrics in zip(chunk, result.get()):
+        song["sanitized_lyrics"] = sanitized_lyrics
+        yield song
+
+
+def main():
+    from tqdm import tqdm
+    from feature_extraction.streaming import SongWriter, read_songs
+
+    songs = sanitize_corpus(read_songs(args.input), args.workers, args.chunk_size, args.field, args.remove_all)
+    with SongWriter(args.output) as writer:
+        for song in tqdm(songs, desc="Sanitization"):
+            writer.write(song)
+
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    parser = argparse.ArgumentParser(description="Sanitizes the lyrics of a JSON lines corpus.")
+    parser.add_argument("--input", dest="input", required=True, help="JSON lines file (optionally gzipped) containing raw lyrics.")
+    parser.add_argument("--output", dest="output", required=True, help="JSON lines file (optionally gzipped) to which the songs with sanitized_lyrics are written.")
+    parser.add_argument("--field", dest="field", default="lyrics", help="The field holding the raw lyrics.")
+    parser.add_argument("--remove-all", dest="remove_all", action="store_true", help="Also remove all remaining [annotations].")
+    parser.add_argument("--workers", dest="workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=256, help="Number of lyrics sent to a worker process at once.")
+    args = parser.parse_args()
+
+    # Run main.
+    main()